@@ -2,8 +2,8 @@ import json
 from sklearn.metrics import classification_report
 from sklearn.preprocessing import MultiLabelBinarizer
 
-with open("outputs/batch_output.json") as f:
-    preds = json.load(f)
+with open("outputs/batch_output.jsonl") as f:
+    preds = [json.loads(line) for line in f if line.strip()]
 with open("data/batch_input.json") as f:
     refs = json.load(f)
 
@@ -1,26 +1,111 @@
+import argparse
 import json
+import time
+import numpy as np
 import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
-model_path = "./outputs"
-model = AutoModelForSequenceClassification.from_pretrained(model_path)
-tokenizer = AutoTokenizer.from_pretrained("bert-base-uncased")
-
 label_list = ["finance", "healthcare", "insurance", "legal", "project_management"]
 
-with open("data/batch_input.json") as f:
-    samples = json.load(f)
 
-predictions = []
-for item in samples:
-    inputs = tokenizer(item["text"], return_tensors="pt", truncation=True, padding=True)
-    with torch.no_grad():
-        logits = model(**inputs).logits
-    probs = torch.sigmoid(logits).squeeze().tolist()
-    labels = [label_list[i] for i, p in enumerate(probs) if p > 0.5]
-    predictions.append({"id": item["id"], "predicted": labels})
+def read_samples(path):
+    # Accept the original JSON list as well as JSONL (one sample per line) for large jobs
+    with open(path) as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(f)
+
+
+def windows(samples, size):
+    # Group the input stream into fixed-size windows; each window is length-sorted
+    # independently so results can be written back in input order as we go
+    window = []
+    for item in samples:
+        window.append(item)
+        if len(window) == size:
+            yield window
+            window = []
+    if window:
+        yield window
+
+
+def predict_window(window, model, tokenizer, label_array, batch_size, max_length, threshold, batch_times):
+    encodings = tokenizer([item["text"] for item in window], truncation=True, max_length=max_length)
+    input_ids = encodings["input_ids"]
+
+    # Length buckets: neighbours in sorted order have similar lengths, so padding is minimal
+    order = np.argsort([len(ids) for ids in input_ids], kind="stable")
+    predicted = [None] * len(window)
+
+    for start in range(0, len(order), batch_size):
+        batch_idx = order[start:start + batch_size]
+        features = [{k: encodings[k][i] for k in encodings.keys()} for i in batch_idx]
+        inputs = tokenizer.pad(features, padding="longest", return_tensors="pt")
+
+        t0 = time.perf_counter()
+        with torch.inference_mode():
+            logits = model(**inputs).logits
+        batch_times.append(time.perf_counter() - t0)
+
+        # Sigmoid + threshold over the whole batch at once
+        mask = (torch.sigmoid(logits) > threshold).numpy()
+        for row, i in zip(mask, batch_idx):
+            predicted[i] = label_array[row].tolist()
+
+    return predicted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched multi-label inference")
+    parser.add_argument("--input", default="data/batch_input.json", help="JSON list or JSONL file with id/text")
+    parser.add_argument("--output", default="outputs/batch_output.jsonl", help="JSONL predictions (input order)")
+    parser.add_argument("--model", default="./outputs", help="Fine-tuned model directory")
+    parser.add_argument("--tokenizer", default="bert-base-uncased")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--sort-window", type=int, default=4096, help="Samples sorted by length together")
+    parser.add_argument("--max-length", type=int, default=512)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--num-threads", type=int, default=None, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    if args.num_threads:
+        torch.set_num_threads(args.num_threads)
+
+    model = AutoModelForSequenceClassification.from_pretrained(args.model)
+    model.eval()
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+    label_array = np.asarray(label_list)
+
+    batch_times = []
+    n_docs = 0
+    start = time.perf_counter()
+
+    with open(args.output, "w") as out:
+        for window in windows(read_samples(args.input), args.sort_window):
+            predicted = predict_window(
+                window, model, tokenizer, label_array,
+                args.batch_size, args.max_length, args.threshold, batch_times,
+            )
+            for item, labels in zip(window, predicted):
+                out.write(json.dumps({"id": item["id"], "predicted": labels}) + "\n")
+            n_docs += len(window)
+
+    elapsed = time.perf_counter() - start
+
+    # Throughput report
+    print(f"Saved predictions to {args.output}")
+    print("Throughput Report:")
+    print(f"  - Documents: {n_docs}")
+    print(f"  - Batches: {len(batch_times)} (batch size {args.batch_size}, threads {torch.get_num_threads()})")
+    print(f"  - Docs/sec: {n_docs / elapsed:.1f}")
+    if batch_times:
+        p50, p95 = np.percentile(batch_times, [50, 95])
+        print(f"  - Batch latency p50: {p50 * 1000:.1f} ms")
+        print(f"  - Batch latency p95: {p95 * 1000:.1f} ms")
 
-with open("outputs/batch_output.json", "w") as f:
-    json.dump(predictions, f, indent=2)
 
-print("Saved predictions to outputs/batch_output.json")
+if __name__ == "__main__":
+    main()
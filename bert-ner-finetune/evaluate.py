@@ -1,63 +1,52 @@
 # evaluate.py — Evaluate BERT NER model on validation set with detailed metrics
-from datasets import load_dataset
-from transformers import AutoTokenizer, AutoModelForTokenClassification, Trainer, TrainingArguments
+import argparse
 import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from transformers import AutoTokenizer, AutoModelForTokenClassification, DataCollatorForTokenClassification
 from seqeval.metrics import classification_report, f1_score
+from preprocess import load_tokenized_dataset
 
-# Load dataset and tokenizer
-dataset = load_dataset("conll2003")
-label_list = dataset["train"].features["ner_tags"].feature.names
-tokenizer = AutoTokenizer.from_pretrained("bert-base-cased")
-
-def tokenize_and_align_labels(example):
-    tokenized_inputs = tokenizer(example["tokens"], truncation=True, is_split_into_words=True)
-    word_ids = tokenized_inputs.word_ids()
-    label_ids = []
-    previous_word_idx = None
-    for word_idx in word_ids:
-        if word_idx is None:
-            label_ids.append(-100)
-        elif word_idx != previous_word_idx:
-            label_ids.append(example["ner_tags"][word_idx])
-        else:
-            label_ids.append(example["ner_tags"][word_idx])
-        previous_word_idx = word_idx
-    tokenized_inputs["labels"] = label_ids
-    return tokenized_inputs
+parser = argparse.ArgumentParser()
+parser.add_argument("--model", default="./outputs/bert-ner")
+parser.add_argument("--split", default="validation")
+parser.add_argument("--batch-size", type=int, default=32)
+args = parser.parse_args()
 
-tokenized = dataset.map(tokenize_and_align_labels, batched=True)
-tokenized.set_format("torch")
+# Load tokenizer and the cached tokenized dataset (built by train.py on first use)
+tokenizer = AutoTokenizer.from_pretrained("bert-base-cased")
+tokenized, label_list = load_tokenized_dataset(tokenizer, num_proc=4)
 
 # Load fine-tuned model
-model = AutoModelForTokenClassification.from_pretrained("./outputs/bert-ner")
-
-# Define Trainer
-def compute_metrics(p):
-    preds, labels = p
-    preds = np.argmax(preds, axis=2)
-
-    true_labels = [
-        [label_list[l] for (p_, l) in zip(pred, lab) if l != -100]
-        for pred, lab in zip(preds, labels)
-    ]
-    true_preds = [
-        [label_list[p_] for (p_, l) in zip(pred, lab) if l != -100]
-        for pred, lab in zip(preds, labels)
-    ]
-    return {"f1": f1_score(true_labels, true_preds)}
-
-args = TrainingArguments(output_dir="./outputs", per_device_eval_batch_size=16)
-trainer = Trainer(model=model, tokenizer=tokenizer, args=args)
-
-# Evaluate
-predictions, labels, _ = trainer.predict(tokenized["validation"])
-metrics = compute_metrics((predictions, labels))
-
-print("F1-score:", metrics["f1"])
-print("
-Full classification report:")
-print(classification_report(
-    [[label_list[l] for l in seq if l != -100] for seq in labels],
-    [[label_list[p] for (p, l) in zip(pred_seq, label_seq) if l != -100]
-     for pred_seq, label_seq in zip(np.argmax(predictions, axis=2), labels)]
-))
+device = "cuda" if torch.cuda.is_available() else "cpu"
+model = AutoModelForTokenClassification.from_pretrained(args.model).to(device)
+model.eval()
+
+loader = DataLoader(
+    tokenized[args.split],
+    batch_size=args.batch_size,
+    collate_fn=DataCollatorForTokenClassification(tokenizer),
+)
+
+# Stream batches: logits are reduced to label ids on-device, and only the ids at labelled
+# positions come back to the host as compact int arrays (no N x seq_len x num_labels tensor)
+pred_chunks, label_chunks, lengths = [], [], []
+with torch.inference_mode():
+    for batch in loader:
+        batch = {k: v.to(device) for k, v in batch.items()}
+        labels = batch.pop("labels")
+        preds = model(**batch).logits.argmax(dim=-1)
+        mask = labels != -100
+        pred_chunks.append(preds[mask].to(torch.int16).cpu().numpy())
+        label_chunks.append(labels[mask].to(torch.int16).cpu().numpy())
+        lengths.append(mask.sum(dim=1).cpu().numpy())
+
+# Convert ids to tag strings once, then split back into sentences for seqeval
+tags = np.asarray(label_list)
+splits = np.cumsum(np.concatenate(lengths))[:-1]
+true_labels = [seq.tolist() for seq in np.split(tags[np.concatenate(label_chunks)], splits)]
+true_preds = [seq.tolist() for seq in np.split(tags[np.concatenate(pred_chunks)], splits)]
+
+print("F1-score:", f1_score(true_labels, true_preds))
+print("\nFull classification report:")
+print(classification_report(true_labels, true_preds))
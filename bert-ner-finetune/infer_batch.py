@@ -0,0 +1,171 @@
+# infer_batch.py — Batched NER tagging of many sentences into character-offset entity spans (JSONL)
+import argparse
+import json
+import time
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModelForTokenClassification
+
+label_list = ['O', 'B-MISC', 'I-MISC', 'B-PER', 'I-PER', 'B-ORG', 'I-ORG', 'B-LOC', 'I-LOC']
+
+
+def read_sentences(path):
+    # JSONL/JSON with {"id", "text"} records, or plain text with one sentence per line
+    with open(path) as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        elif path.endswith(".json"):
+            yield from json.load(f)
+        else:
+            for i, line in enumerate(f):
+                if line.strip():
+                    yield {"id": i, "text": line.rstrip("\n")}
+
+
+def windows(items, size):
+    window = []
+    for item in items:
+        window.append(item)
+        if len(window) == size:
+            yield window
+            window = []
+    if window:
+        yield window
+
+
+def label_tables(labels):
+    # Per label id: entity type index (-1 for O) and whether it is a B- tag
+    types = sorted({l[2:] for l in labels if l != 'O'})
+    type_of = np.array([types.index(l[2:]) if l != 'O' else -1 for l in labels])
+    is_begin = np.array([l.startswith('B-') for l in labels])
+    return types, type_of, is_begin
+
+
+def aggregate_entities(pred_ids, scores, word_ids, offsets, type_of, is_begin):
+    # Merge B-/I- wordpieces into entity spans for a whole batch at once.
+    # pred_ids, scores, word_ids: (B, L); offsets: (B, L, 2); word_ids is -1 for special/pad tokens.
+    # Returns (row, type index, start char, end char, mean score) arrays.
+    B, L = word_ids.shape
+    valid = word_ids >= 0
+    prev_word = np.concatenate([np.full((B, 1), -1), word_ids[:, :-1]], axis=1)
+    next_word = np.concatenate([word_ids[:, 1:], np.full((B, 1), -1)], axis=1)
+    first_piece = valid & (word_ids != prev_word)
+    last_piece = valid & (word_ids != next_word)
+
+    # Words in row-major order; a word takes the label of its first wordpiece
+    rows = np.nonzero(first_piece)[0]
+    word_type = type_of[pred_ids[first_piece]]
+    word_begin = is_begin[pred_ids[first_piece]]
+    word_score = scores[first_piece]
+    word_start = offsets[..., 0][first_piece]
+    word_end = offsets[..., 1][last_piece]
+
+    prev_type = np.concatenate([[-1], word_type[:-1]])
+    new_row = np.concatenate([[True], rows[1:] != rows[:-1]])
+    inside = word_type >= 0
+    starts = inside & (word_begin | new_row | (word_type != prev_type))
+
+    # Entity words form contiguous runs; each run begins at a start word
+    group = np.cumsum(starts)[inside]
+    ent_words = np.flatnonzero(inside)
+    if not len(ent_words):
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, empty, np.empty(0)
+    run_first = np.flatnonzero(np.concatenate([[True], group[1:] != group[:-1]]))
+    run_last = np.concatenate([run_first[1:], [len(ent_words)]]) - 1
+    first, last = ent_words[run_first], ent_words[run_last]
+    mean_score = np.add.reduceat(word_score[ent_words], run_first) / (run_last - run_first + 1)
+    return rows[first], word_type[first], word_start[first], word_end[last], mean_score
+
+
+def pad_rows(rows, length, fill):
+    out = np.full((len(rows), length) + np.shape(rows[0])[1:], fill, dtype=np.int64)
+    for i, row in enumerate(rows):
+        out[i, :len(row)] = row
+    return out
+
+
+def tag_window(window, model, tokenizer, tables, batch_size, max_length, batch_times):
+    # Tokenize the whole window once, then run length-sorted, dynamically padded batches
+    types, type_of, is_begin = tables
+    texts = [item["text"] for item in window]
+    enc = tokenizer(texts, truncation=True, max_length=max_length, return_offsets_mapping=True)
+    word_ids = [[-1 if w is None else w for w in enc.word_ids(i)] for i in range(len(texts))]
+    lengths = [len(ids) for ids in enc["input_ids"]]
+    order = np.argsort(lengths, kind="stable")
+    model_keys = [k for k in ("input_ids", "attention_mask", "token_type_ids") if k in enc]
+    entities = [None] * len(window)
+
+    for start in range(0, len(order), batch_size):
+        batch_idx = order[start:start + batch_size]
+        length = max(lengths[i] for i in batch_idx)
+        inputs = {
+            k: torch.from_numpy(pad_rows([enc[k][i] for i in batch_idx], length, tokenizer.pad_token_id if k == "input_ids" else 0))
+            for k in model_keys
+        }
+
+        t0 = time.perf_counter()
+        with torch.inference_mode():
+            probs = model(**inputs).logits.softmax(dim=-1)
+        batch_times.append(time.perf_counter() - t0)
+        scores, pred_ids = probs.max(dim=-1)
+
+        rows, ent_types, starts, ends, ent_scores = aggregate_entities(
+            pred_ids.numpy(), scores.numpy(),
+            pad_rows([word_ids[i] for i in batch_idx], length, -1),
+            pad_rows([enc["offset_mapping"][i] for i in batch_idx], length, 0),
+            type_of, is_begin,
+        )
+        for i in batch_idx:
+            entities[i] = []
+        for row, t, s, e, score in zip(rows.tolist(), ent_types.tolist(), starts.tolist(), ends.tolist(), ent_scores.tolist()):
+            i = batch_idx[row]
+            entities[i].append({"type": types[t], "start": s, "end": e, "text": texts[i][s:e], "score": round(score, 4)})
+
+    return entities, sum(lengths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched NER inference")
+    parser.add_argument("--input", required=True, help="JSONL/JSON with id/text, or a text file with one sentence per line")
+    parser.add_argument("--output", default="outputs/ner_predictions.jsonl")
+    parser.add_argument("--model", default="./outputs/bert-ner")
+    parser.add_argument("--tokenizer", default="bert-base-cased")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--sort-window", type=int, default=8192, help="Sentences sorted by length together")
+    parser.add_argument("--max-length", type=int, default=256)
+    args = parser.parse_args()
+
+    model = AutoModelForTokenClassification.from_pretrained(args.model)
+    model.eval()
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+    labels = [model.config.id2label[i] for i in range(model.config.num_labels)]
+    if any(l.startswith("LABEL_") for l in labels):
+        labels = label_list
+    tables = label_tables(labels)
+
+    batch_times = []
+    n_sentences = n_tokens = n_entities = 0
+    start = time.perf_counter()
+    with open(args.output, "w") as out:
+        for window in windows(read_sentences(args.input), args.sort_window):
+            entities, tokens = tag_window(window, model, tokenizer, tables, args.batch_size, args.max_length, batch_times)
+            for item, ents in zip(window, entities):
+                out.write(json.dumps({"id": item["id"], "entities": ents}) + "\n")
+            n_sentences += len(window)
+            n_tokens += tokens
+            n_entities += sum(len(e) for e in entities)
+    elapsed = time.perf_counter() - start
+
+    print(f"Saved {n_entities} entities for {n_sentences} sentences to {args.output}")
+    print(f"  - Sentences/sec: {n_sentences / elapsed:.1f}")
+    print(f"  - Tokens/sec: {n_tokens / elapsed:.1f}")
+    if batch_times:
+        p50, p95 = np.percentile(batch_times, [50, 95])
+        print(f"  - Batch latency p50: {p50 * 1000:.1f} ms, p95: {p95 * 1000:.1f} ms (batch size {args.batch_size})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# preprocess.py — Shared CoNLL-2003 tokenization + label alignment with a fingerprinted on-disk cache
+import hashlib
+import json
+import os
+import numpy as np
+from datasets import load_dataset, load_from_disk
+
+# Bump when the alignment logic changes so stale caches are not reused
+CACHE_VERSION = 1
+
+
+def tokenize_and_align_labels(examples, tokenizer, max_length=None, label_all_tokens=True):
+    # Batched: examples["tokens"] is a list of sentences. Special tokens get -100; every
+    # wordpiece takes its word's tag, or only the first piece if label_all_tokens=False.
+    tokenized_inputs = tokenizer(examples["tokens"], truncation=True, max_length=max_length, is_split_into_words=True)
+    all_labels = []
+    for i, tags in enumerate(examples["ner_tags"]):
+        word_ids = np.array([-1 if w is None else w for w in tokenized_inputs.word_ids(batch_index=i)])
+        labels = np.where(word_ids >= 0, np.asarray(tags)[word_ids.clip(min=0)], -100)
+        if not label_all_tokens:
+            continuation = word_ids == np.concatenate([[-1], word_ids[:-1]])
+            labels[continuation & (word_ids >= 0)] = -100
+        all_labels.append(labels.tolist())
+    tokenized_inputs["labels"] = all_labels
+    return tokenized_inputs
+
+
+def cache_fingerprint(dataset, dataset_name, tokenizer, max_length, label_all_tokens):
+    # Raw split fingerprints + tokenizer + alignment settings identify a tokenized dataset
+    key = {
+        "version": CACHE_VERSION,
+        "dataset": dataset_name,
+        "splits": {split: ds._fingerprint for split, ds in dataset.items()},
+        "tokenizer": [type(tokenizer).__name__, tokenizer.name_or_path, len(tokenizer)],
+        "max_length": max_length,
+        "label_all_tokens": label_all_tokens,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def load_tokenized_dataset(tokenizer, dataset_name="conll2003", cache_dir="data/tokenized", num_proc=None,
+                           max_length=None, label_all_tokens=True):
+    # Returns (tokenized DatasetDict, label_list). The first call tokenizes with num_proc
+    # workers and saves to cache_dir/<fingerprint>; later runs load it from disk.
+    dataset = load_dataset(dataset_name)
+    label_list = dataset["train"].features["ner_tags"].feature.names
+
+    fingerprint = cache_fingerprint(dataset, dataset_name, tokenizer, max_length, label_all_tokens)
+    path = os.path.join(cache_dir, f"{dataset_name}-{fingerprint}")
+    if os.path.isdir(path):
+        print(f"Loading tokenized dataset from {path}")
+        tokenized = load_from_disk(path)
+    else:
+        tokenized = dataset.map(
+            tokenize_and_align_labels,
+            batched=True,
+            num_proc=num_proc,
+            remove_columns=dataset["train"].column_names,
+            fn_kwargs={"tokenizer": tokenizer, "max_length": max_length, "label_all_tokens": label_all_tokens},
+        )
+        tokenized.save_to_disk(path)
+        print(f"Saved tokenized dataset to {path}")
+
+    tokenized.set_format("torch")
+    return tokenized, label_list
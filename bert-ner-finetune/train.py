@@ -1,31 +1,13 @@
 # train.py — Fine-tune BERT for NER on CoNLL-2003
-from datasets import load_dataset
 from transformers import AutoTokenizer, AutoModelForTokenClassification, TrainingArguments, Trainer
 from seqeval.metrics import f1_score
 import numpy as np
+from preprocess import load_tokenized_dataset
 
-label_list = load_dataset("conll2003")["train"].features["ner_tags"].feature.names
 tokenizer = AutoTokenizer.from_pretrained("bert-base-cased")
 
-def tokenize_and_align_labels(example):
-    tokenized_inputs = tokenizer(example["tokens"], truncation=True, is_split_into_words=True)
-    word_ids = tokenized_inputs.word_ids()
-    label_ids = []
-    previous_word_idx = None
-    for word_idx in word_ids:
-        if word_idx is None:
-            label_ids.append(-100)
-        elif word_idx != previous_word_idx:
-            label_ids.append(example["ner_tags"][word_idx])
-        else:
-            label_ids.append(example["ner_tags"][word_idx])
-        previous_word_idx = word_idx
-    tokenized_inputs["labels"] = label_ids
-    return tokenized_inputs
-
-dataset = load_dataset("conll2003")
-dataset = dataset.map(tokenize_and_align_labels, batched=True)
-dataset.set_format("torch")
+# Tokenized once with parallel workers and cached on disk (shared with evaluate.py)
+dataset, label_list = load_tokenized_dataset(tokenizer, num_proc=4)
 
 model = AutoModelForTokenClassification.from_pretrained("bert-base-cased", num_labels=len(label_list))
 
@@ -0,0 +1,82 @@
+# benchmark_index.py — Compare FAISS backends on a synthetic corpus: recall@k vs. flat, latency, build time, memory
+import argparse
+import time
+import faiss
+import numpy as np
+from search_engine import INDEX_TYPES, create_index, train_index, search_parameters
+
+
+def synthetic_corpus(n, dim, n_queries, n_clusters, seed):
+    # Gaussian mixture on the unit sphere: clustered like real sentence embeddings,
+    # so IVF partitioning behaves realistically
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    corpus = centers[rng.integers(n_clusters, size=n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    queries = corpus[rng.integers(n, size=n_queries)] + 0.3 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+    faiss.normalize_L2(corpus)
+    faiss.normalize_L2(queries)
+    return corpus, queries
+
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def benchmark(index_type, corpus, queries, truth, top_k, nprobe, ef_search, train_size):
+    start = time.perf_counter()
+    index = create_index(corpus.shape[1], len(corpus), index_type)
+    train_index(index, corpus, train_size)
+    index.add(corpus)
+    build_time = time.perf_counter() - start
+
+    params = search_parameters(index_type, nprobe, ef_search)
+    latencies = []
+    found = np.empty_like(truth)
+    for i in range(len(queries)):
+        t0 = time.perf_counter()
+        _, I = index.search(queries[i:i + 1], top_k, params=params)
+        latencies.append(time.perf_counter() - t0)
+        found[i] = I[0]
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return {
+        "index": index_type,
+        "recall": recall_at_k(found, truth),
+        "p50_ms": p50,
+        "p99_ms": p99,
+        "build_s": build_time,
+        "memory_mb": faiss.serialize_index(index).nbytes / 2**20,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=100_000, help="Corpus size")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension (all-MiniLM-L6-v2 = 384)")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--train-size", type=int, default=None)
+    parser.add_argument("--index", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads (1 = per-request latency)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    corpus, queries = synthetic_corpus(args.n, args.dim, args.queries, args.clusters, args.seed)
+
+    # Exact neighbours from the brute-force index are the recall reference
+    exact = faiss.IndexFlatIP(args.dim)
+    exact.add(corpus)
+    _, truth = exact.search(queries, args.top_k)
+
+    print(f"📦 Corpus: {args.n} x {args.dim}, {args.queries} queries, k={args.top_k}, "
+          f"nprobe={args.nprobe}, efSearch={args.ef_search}\n")
+    print(f"{'index':<10}{f'recall@{args.top_k}':>11}{'p50 ms':>10}{'p99 ms':>10}{'build s':>10}{'mem MB':>10}")
+    for index_type in args.index:
+        r = benchmark(index_type, corpus, queries, truth, args.top_k, args.nprobe, args.ef_search, args.train_size)
+        print(f"{r['index']:<10}{r['recall']:>11.3f}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+              f"{r['build_s']:>10.2f}{r['memory_mb']:>10.1f}")
@@ -3,37 +3,538 @@ from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
 import json
+import os
+import re
+import hashlib
+from array import array
+from collections import OrderedDict
+from itertools import islice
+
+def faiss_mmap_flags(index_type):
+    # IO_FLAG_MMAP maps IVF inverted lists (OnDiskInvertedLists) but leaves flat/HNSW codes in RAM;
+    # IO_FLAG_MMAP_IFC (newer builds) maps flat/HNSW codes but copies IVF lists into ArrayInvertedLists.
+    # The two cannot be combined, so pick the one that maps this index type's codes.
+    if index_type.startswith('ivf_') or not hasattr(faiss, 'IO_FLAG_MMAP_IFC'):
+        return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    return faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+
+
+INDEX_TYPES = ('flat', 'ivf_flat', 'ivf_pq', 'hnsw')
+
+
+def default_nlist(n):
+    # ~4*sqrt(n) inverted lists, but keep at least 39 training points per centroid
+    return max(1, min(int(4 * np.sqrt(n)), n // 39))
+
+
+def create_index(dim, n, index_type='flat', nlist=None, pq_m=16, pq_nbits=8, hnsw_m=32, ef_construction=200):
+    # All backends score by inner product, i.e. cosine on normalized embeddings
+    if index_type == 'flat':
+        return faiss.IndexFlatIP(dim)
+    if index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = ef_construction
+        return index
+    if index_type in ('ivf_flat', 'ivf_pq'):
+        nlist = nlist or default_nlist(n)
+        quantizer = faiss.IndexFlatIP(dim)
+        if index_type == 'ivf_flat':
+            return faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        if dim % pq_m:
+            raise ValueError(f"pq_m={pq_m} must divide the embedding dimension {dim}")
+        return faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_nbits, faiss.METRIC_INNER_PRODUCT)
+    raise ValueError(f"Unknown index_type {index_type!r}, expected one of {INDEX_TYPES}")
+
+
+def training_sample_size(index, train_size=None):
+    # 64 points per centroid by default; PQ codebooks need 2**nbits centroids each as well
+    if train_size:
+        return train_size
+    ivf = faiss.downcast_index(faiss.extract_index_ivf(index))
+    centroids = ivf.nlist
+    if isinstance(ivf, faiss.IndexIVFPQ):
+        centroids = max(centroids, ivf.pq.ksub)
+    return 64 * centroids
+
+
+def train_index(index, embeddings, train_size=None, seed=0):
+    # IVF backends learn their coarse centroids (and PQ codebooks) from a random sample
+    if index.is_trained:
+        return
+    train_size = min(len(embeddings), training_sample_size(index, train_size))
+    if train_size < len(embeddings):
+        rng = np.random.default_rng(seed)
+        embeddings = embeddings[np.sort(rng.choice(len(embeddings), train_size, replace=False))]
+    index.train(np.ascontiguousarray(embeddings, dtype=np.float32))
+
+
+def search_parameters(index_type, nprobe=None, ef_search=None):
+    # Query-time knobs: lists probed for IVF, candidate queue size for HNSW
+    if index_type in ('ivf_flat', 'ivf_pq') and nprobe:
+        return faiss.SearchParametersIVF(nprobe=nprobe)
+    if index_type == 'hnsw' and ef_search:
+        return faiss.SearchParametersHNSW(efSearch=ef_search)
+    return None
+
+
+def content_hash(text):
+    # 64-bit digest of the document text; unchanged documents skip re-embedding on upsert
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def add_id_map(index):
+    # Flat and HNSW indexes number vectors sequentially; wrap them so FAISS labels are
+    # stable slots that survive removals. IVF indexes take explicit ids natively.
+    if faiss.try_extract_index_ivf(index) is None:
+        return faiss.IndexIDMap2(index)
+    return index
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def _iter_json_array(f, block_size=1 << 20):
+    # Decode a top-level JSON array one element at a time, reading fixed-size blocks.
+    # pos is a cursor into buf; the consumed prefix is only dropped when a block is appended.
+    # expect is what may come next: 'first' (element or ']'), 'sep' (',' or ']') or 'value' (element).
+    decoder = json.JSONDecoder()
+    buf = f.read(block_size)
+    while buf.isspace():
+        buf = f.read(block_size)
+    pos = len(buf) - len(buf.lstrip())
+    if buf[pos:pos + 1] != '[':
+        raise ValueError(f"{f.name}: expected a JSON array of documents")
+    pos += 1
+    expect = 'first'
+    eof = False
+    while True:
+        pos = _WHITESPACE.match(buf, pos).end()
+        if pos < len(buf):
+            char = buf[pos]
+            if char == ']' and expect != 'value':
+                return
+            if expect == 'sep':
+                if char != ',':
+                    raise ValueError(f"{f.name}: expected ',' or ']' after an array element")
+                pos += 1
+                expect = 'value'
+                continue
+            if char in ',]':
+                raise ValueError(f"{f.name}: expected an array element, got {char!r}")
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = None
+            # An element ending exactly at the buffer end may be a truncated number or literal
+            if end is not None and (end < len(buf) or eof):
+                yield item
+                pos = end
+                expect = 'sep'
+                continue
+        elif eof:
+            raise ValueError(f"{f.name}: unterminated JSON array")
+        block = f.read(block_size)
+        eof = not block
+        buf = buf[pos:] + block
+        pos = 0
+
+
+def iter_corpus(path):
+    # Stream {'id', 'text'} documents from a JSONL file, a JSON array, or a directory of
+    # JSON/JSONL chunk files (read in sorted order)
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith(('.json', '.jsonl')):
+                yield from iter_corpus(os.path.join(path, name))
+        return
+    with open(path, 'r') as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from _iter_json_array(f)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# Bounded LRU of query embeddings keyed by the normalized query string
+class QueryEmbeddingCache:
+    def __init__(self, maxsize=10000, lowercase=True):
+        self.maxsize = maxsize
+        self.lowercase = lowercase
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def normalize(self, query):
+        query = ' '.join(query.split())
+        return query.lower() if self.lowercase else query
+
+    def get(self, key):
+        vec = self._entries.get(key)
+        if vec is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return vec
+
+    def put(self, key, vec):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = vec
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate}
+
+
+# Texts packed into one UTF-8 blob with an int64 offset index, so a snapshot can be
+# memory-mapped instead of materialising a Python list of str
+class TextStore:
+    def __init__(self, data, offsets, path=None):
+        self.data = data
+        self.offsets = offsets
+        self.path = path
+        # Texts appended after loading (upserts) live in memory until the next save
+        self.tail = []
+
+    def __len__(self):
+        return len(self.offsets) - 1 + len(self.tail)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        n_packed = len(self.offsets) - 1
+        if i >= n_packed:
+            return self.tail[i - n_packed]
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def append(self, text):
+        self.tail.append(text)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @staticmethod
+    def write(texts, path):
+        writer = TextStoreWriter(path)
+        for text in texts:
+            writer.append(text)
+        writer.close()
+
+    @classmethod
+    def open(cls, path, mmap=True):
+        offsets = np.load(os.path.join(path, 'text_offsets.npy'), mmap_mode='r' if mmap else None)
+        blob_path = os.path.join(path, 'texts.bin')
+        if offsets[-1] == 0:
+            data = np.empty(0, dtype=np.uint8)
+        elif mmap:
+            data = np.memmap(blob_path, dtype=np.uint8, mode='r')
+        else:
+            data = np.fromfile(blob_path, dtype=np.uint8)
+        return cls(data, offsets, path)
+
+
+# Appends texts straight to disk; offsets are kept in a compact int64 array. Files are
+# written next to the target and renamed over it, so a store that is still mapped from
+# the same directory keeps a consistent view.
+class TextStoreWriter:
+    def __init__(self, path):
+        self.blob_path = os.path.join(path, 'texts.bin')
+        self.offsets_path = os.path.join(path, 'text_offsets.npy')
+        self.offsets = array('q', [0])
+        self._file = open(self.blob_path + '.tmp', 'wb')
+
+    def append(self, text):
+        encoded = text.encode('utf-8')
+        self._file.write(encoded)
+        self.offsets.append(self.offsets[-1] + len(encoded))
+
+    def close(self):
+        self._file.close()
+        with open(self.offsets_path + '.tmp', 'wb') as f:
+            np.save(f, np.frombuffer(self.offsets, dtype=np.int64))
+        os.replace(self.blob_path + '.tmp', self.blob_path)
+        os.replace(self.offsets_path + '.tmp', self.offsets_path)
+
 
 class SemanticSearchEngine:
-    def __init__(self, model_name='all-MiniLM-L6-v2'):
+    def __init__(self, model_name='all-MiniLM-L6-v2', nprobe=16, ef_search=64, cache_size=10000):
+        self.model_name = model_name
         self.model = SentenceTransformer(model_name)
+        self.query_cache = QueryEmbeddingCache(cache_size)
         self.index = None
+        self.index_type = 'flat'
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.read_only = False
+        # texts/ids/hashes are slot-aligned and FAISS labels are slot numbers; a deleted
+        # or replaced document keeps its slot with id None and is removed from the index
         self.texts = []
         self.ids = []
+        self.hashes = []
+        self.slots = {}
 
     def load_corpus(self, path):
-        with open(path, 'r') as f:
-            data = json.load(f)
+        data = list(iter_corpus(path))
         self.texts = [item['text'] for item in data]
         self.ids = [item['id'] for item in data]
         return data
 
-    def build_index(self):
+    def build_index(self, index_type='flat', train_size=None, **index_params):
+        # index_type: flat (exact), ivf_flat, ivf_pq or hnsw; index_params go to create_index
         embeddings = self.model.encode(self.texts, convert_to_numpy=True, normalize_embeddings=True)
-        dim = embeddings.shape[1]
-        self.index = faiss.IndexFlatIP(dim)
-        self.index.add(embeddings)
+        n, dim = embeddings.shape
+        self.index = add_id_map(create_index(dim, n, index_type, **index_params))
+        train_index(self.index, embeddings, train_size)
+        self.index.add_with_ids(embeddings, np.arange(n, dtype=np.int64))
+        self.index_type = index_type
+        self.hashes = [content_hash(text) for text in self.texts]
+        self.slots = {doc_id: slot for slot, doc_id in enumerate(self.ids)}
+
+    def ingest(self, path, store_dir, chunk_size=10000, batch_size=64, index_type='flat',
+               expected_size=None, train_size=None, **index_params):
+        # Bounded-memory alternative to load_corpus + build_index: documents are read,
+        # encoded and added chunk by chunk, and texts go straight to a TextStore in store_dir.
+        # IVF backends need nlist or expected_size up front; their first chunks are held
+        # back until a training sample is available.
+        if index_type in ('ivf_flat', 'ivf_pq') and not (index_params.get('nlist') or expected_size):
+            raise ValueError("Streaming IVF ingestion needs nlist or expected_size to size the index")
+        os.makedirs(store_dir, exist_ok=True)
+        writer = TextStoreWriter(store_dir)
+        self.index = None
+        self.index_type = index_type
+        self.ids, self.hashes, self.slots = [], [], {}
+
+        pending = []
+        for chunk in _chunks(iter_corpus(path), chunk_size):
+            texts = [doc['text'] for doc in chunk]
+            embeddings = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+            if self.index is None:
+                dim = embeddings.shape[1]
+                self.index = add_id_map(create_index(dim, expected_size or len(chunk), index_type, **index_params))
+
+            pending.append((len(self.ids), embeddings))
+            for doc, text in zip(chunk, texts):
+                writer.append(text)
+                self.slots[doc['id']] = len(self.ids)
+                self.ids.append(doc['id'])
+                self.hashes.append(content_hash(text))
+
+            if self.index.is_trained or sum(len(e) for _, e in pending) >= training_sample_size(self.index, train_size):
+                self._add_pending(pending, train_size)
+                pending = []
+
+        writer.close()
+        if self.index is None:
+            raise ValueError(f"No documents found in {path}")
+        self._add_pending(pending, train_size)
+        self.texts = TextStore.open(store_dir, mmap=True)
+        return len(self.ids)
 
-    def search(self, query, top_k=3):
-        query_vec = self.model.encode([query], convert_to_numpy=True, normalize_embeddings=True)
-        D, I = self.index.search(query_vec, k=top_k)
-        results = [(self.texts[i], float(D[0][j])) for j, i in enumerate(I[0])]
-        return results
+    def _add_pending(self, pending, train_size):
+        if not pending:
+            return
+        if not self.index.is_trained:
+            train_index(self.index, np.concatenate([e for _, e in pending]), train_size)
+        for start, embeddings in pending:
+            self.index.add_with_ids(embeddings, np.arange(start, start + len(embeddings), dtype=np.int64))
+
+    def _check_writable(self):
+        if self.read_only:
+            raise ValueError("Snapshot was loaded with mmap=True and is read-only; load it with mmap=False to modify")
+
+    def _check_removable(self, slots):
+        if slots and self.index_type == 'hnsw':
+            raise ValueError("HNSW indexes do not support removal; rebuild with build_index() instead")
+
+    def _remove_slots(self, slots):
+        if not slots:
+            return
+        self.index.remove_ids(np.asarray(slots, dtype=np.int64))
+        for slot in slots:
+            self.ids[slot] = None
+
+    def upsert(self, docs):
+        # docs: iterable of {'id', 'text'}. New and changed documents are embedded in one
+        # call and appended as new slots; documents with an unchanged content hash are skipped
+        self._check_writable()
+        pending = {}
+        for doc in docs:
+            pending[doc['id']] = doc['text']
+
+        changed = []
+        unchanged = 0
+        for doc_id, text in pending.items():
+            digest = content_hash(text)
+            slot = self.slots.get(doc_id)
+            if slot is not None and self.hashes[slot] == digest:
+                unchanged += 1
+            else:
+                changed.append((doc_id, text, digest))
+
+        if not changed:
+            return {'added': 0, 'updated': 0, 'unchanged': unchanged}
+        stale = [self.slots[doc_id] for doc_id, _, _ in changed if doc_id in self.slots]
+        self._check_removable(stale)
+
+        embeddings = self.model.encode([text for _, text, _ in changed], convert_to_numpy=True, normalize_embeddings=True)
+        if self.index is None:
+            self.index = add_id_map(create_index(embeddings.shape[1], len(changed)))
+            self.index_type = 'flat'
+        self._remove_slots(stale)
+
+        start = len(self.ids)
+        for doc_id, text, digest in changed:
+            self.slots[doc_id] = len(self.ids)
+            self.ids.append(doc_id)
+            self.texts.append(text)
+            self.hashes.append(digest)
+        self.index.add_with_ids(embeddings, np.arange(start, len(self.ids), dtype=np.int64))
+        return {'added': len(changed) - len(stale), 'updated': len(stale), 'unchanged': unchanged}
+
+    def delete(self, ids):
+        self._check_writable()
+        slots = [self.slots[doc_id] for doc_id in ids if doc_id in self.slots]
+        self._check_removable(slots)
+        for doc_id in ids:
+            self.slots.pop(doc_id, None)
+        self._remove_slots(slots)
+        return len(slots)
+
+    def encode_queries(self, queries):
+        # Cached embeddings are reused; all misses are encoded together in one model call
+        keys = [self.query_cache.normalize(q) for q in queries]
+        vectors = {}
+        missing = []
+        for key in keys:
+            if key in vectors:
+                # Repeat within the batch: served without another encode
+                self.query_cache.hits += 1
+                continue
+            vec = self.query_cache.get(key)
+            if vec is None:
+                missing.append(key)
+                vectors[key] = None
+            else:
+                vectors[key] = vec
+        if missing:
+            encoded = self.model.encode(missing, convert_to_numpy=True, normalize_embeddings=True)
+            for key, vec in zip(missing, encoded):
+                vectors[key] = vec
+                self.query_cache.put(key, vec)
+        return np.stack([vectors[key] for key in keys]).astype(np.float32, copy=False)
+
+    def search_batch(self, queries, top_k=3, nprobe=None, ef_search=None):
+        # One encode call and one index.search over the stacked query matrix;
+        # returns a list of [(id, text, score), ...] per query
+        if not queries:
+            return []
+        query_vecs = self.encode_queries(queries)
+        params = search_parameters(self.index_type, nprobe or self.nprobe, ef_search or self.ef_search)
+        D, I = self.index.search(query_vecs, k=top_k, params=params)
+        return [
+            [(self.ids[i], self.texts[i], float(d)) for d, i in zip(D[row], I[row]) if i != -1]
+            for row in range(len(queries))
+        ]
+
+    def search(self, query, top_k=3, nprobe=None, ef_search=None):
+        results = self.search_batch([query], top_k, nprobe, ef_search)[0]
+        return [(text, score) for _, text, score in results]
+
+    def save(self, path):
+        # Snapshot layout: index.faiss, texts.bin + text_offsets.npy, ids.json, hashes.npy, meta.json
+        os.makedirs(path, exist_ok=True)
+        index_path = os.path.join(path, 'index.faiss')
+        faiss.write_index(self.index, index_path + '.tmp')
+        os.replace(index_path + '.tmp', index_path)
+        # Texts ingested into this directory are already on disk
+        texts = self.texts
+        in_place = isinstance(texts, TextStore) and not texts.tail and texts.path and os.path.samefile(texts.path, path)
+        if not in_place:
+            TextStore.write(texts, path)
+        with open(os.path.join(path, 'ids.json'), 'w') as f:
+            json.dump(list(self.ids), f)
+        np.save(os.path.join(path, 'hashes.npy'), np.asarray(self.hashes, dtype=np.uint64))
+        meta = {
+            'model_name': self.model_name,
+            'dim': self.index.d,
+            'index_type': self.index_type,
+            'count': len(self.slots),
+        }
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        # Restore a snapshot without re-embedding; with mmap=True the index and texts are
+        # mapped read-only so worker processes on one host share the same page cache
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        engine = cls(model_name=meta['model_name'])
+        dim = engine.model.get_sentence_embedding_dimension()
+        if dim != meta['dim']:
+            raise ValueError(f"Model {meta['model_name']} produces {dim}-d embeddings, snapshot has {meta['dim']}")
+
+        engine.index_type = meta.get('index_type', 'flat')
+        flags = faiss_mmap_flags(engine.index_type) if mmap else 0
+        engine.index = faiss.read_index(os.path.join(path, 'index.faiss'), flags)
+        engine.texts = TextStore.open(path, mmap=mmap)
+        with open(os.path.join(path, 'ids.json'), 'r') as f:
+            engine.ids = json.load(f)
+        engine.hashes = np.load(os.path.join(path, 'hashes.npy')).tolist()
+        engine.slots = {doc_id: slot for slot, doc_id in enumerate(engine.ids) if doc_id is not None}
+        # FAISS cannot grow or shrink a memory-mapped index in place
+        engine.read_only = mmap
+        return engine
 
 if __name__ == "__main__":
-    engine = SemanticSearchEngine()
-    engine.load_corpus("data/corpus.json")
-    engine.build_index()
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", type=str, default="data/corpus.json", help="JSON corpus to index")
+    parser.add_argument("--snapshot", type=str, default=None, help="Index snapshot directory (loaded if present, else built and saved)")
+    parser.add_argument("--index-type", type=str, default="flat", choices=INDEX_TYPES, help="FAISS backend used when building")
+    parser.add_argument("--stream", action="store_true", help="Ingest the corpus in bounded-memory chunks (requires --snapshot)")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Documents per streamed chunk")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (required for streamed IVF ingestion)")
+    args = parser.parse_args()
+
+    if args.snapshot and os.path.exists(os.path.join(args.snapshot, 'meta.json')):
+        engine = SemanticSearchEngine.load(args.snapshot, mmap=True)
+    elif args.stream:
+        if not args.snapshot:
+            parser.error("--stream needs --snapshot to hold the on-disk text store")
+        engine = SemanticSearchEngine()
+        index_params = {'nlist': args.nlist} if args.nlist else {}
+        engine.ingest(args.corpus, args.snapshot, chunk_size=args.chunk_size, index_type=args.index_type, **index_params)
+        engine.save(args.snapshot)
+    else:
+        engine = SemanticSearchEngine()
+        engine.load_corpus(args.corpus)
+        engine.build_index(index_type=args.index_type)
+        if args.snapshot:
+            engine.save(args.snapshot)
     query = "How to submit an insurance claim?"
     results = engine.search(query)
     for text, score in results:
@@ -1,13 +1,25 @@
+import argparse
 import json
 from scipy.stats import pearsonr, spearmanr
 
-with open("outputs/batch_output.json") as f:
+parser = argparse.ArgumentParser()
+parser.add_argument("--predictions", default="outputs/batch_output.json", help="Output of predict_batch.py (either mode)")
+parser.add_argument("--references", default="data/batch_input.json")
+parser.add_argument("--score-field", choices=["score", "rerank_score"], default="score",
+                    help="rerank_score: cross-encoder scores of the pairs reranked by --rerank-top (only those pairs)")
+args = parser.parse_args()
+
+with open(args.predictions) as f:
     preds = json.load(f)
-with open("data/batch_input.json") as f:
+with open(args.references) as f:
     refs = json.load(f)
 
-y_pred = [p["score"] for p in preds]
-y_true = [r["label"] for r in refs]
+# Align on id so outputs from either scoring mode can be compared on the same data
+scores = {p["id"]: p[args.score_field] for p in preds if args.score_field in p}
+y_pred = [scores[r["id"]] for r in refs if r["id"] in scores]
+y_true = [r["label"] for r in refs if r["id"] in scores]
+
+print(f"{len(y_pred)} of {len(refs)} pairs scored by '{args.score_field}'")
 
 print("Pearson:", pearsonr(y_pred, y_true)[0])
 print("Spearman:", spearmanr(y_pred, y_true)[0])
@@ -1,23 +1,109 @@
+import argparse
 import json
+import time
 import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import torch.nn.functional as F
+from transformers import AutoTokenizer, AutoModel, AutoModelForSequenceClassification
 
-model_path = "./outputs"
-model = AutoModelForSequenceClassification.from_pretrained(model_path)
-tokenizer = AutoTokenizer.from_pretrained("bert-base-uncased")
 
-with open("data/batch_input.json") as f:
-    pairs = json.load(f)
+def cross_encode(pairs, model_path, tokenizer_name, batch_size):
+    # Full cross-encoder: every (sentence1, sentence2) pair goes through BERT together
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
 
-results = []
-for item in pairs:
-    inputs = tokenizer(item["sentence1"], item["sentence2"], return_tensors="pt", truncation=True, padding=True)
-    with torch.no_grad():
-        outputs = model(**inputs)
-    score = outputs.logits.item()
-    results.append({"id": item["id"], "score": score})
+    scores = []
+    for start in range(0, len(pairs), batch_size):
+        batch = pairs[start:start + batch_size]
+        inputs = tokenizer(
+            [p["sentence1"] for p in batch],
+            [p["sentence2"] for p in batch],
+            return_tensors="pt", truncation=True, padding=True,
+        )
+        with torch.inference_mode():
+            logits = model(**inputs).logits
+        scores.extend(logits.squeeze(-1).tolist())
+    return scores
 
-with open("outputs/batch_output.json", "w") as f:
-    json.dump(results, f, indent=2)
 
-print("Batch inference complete. Saved to outputs/batch_output.json.")
+def encode_sentences(sentences, model_name, batch_size):
+    # Mean-pooled, L2-normalized sentence embeddings
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    chunks = []
+    for start in range(0, len(sentences), batch_size):
+        inputs = tokenizer(sentences[start:start + batch_size], return_tensors="pt", truncation=True, padding=True)
+        with torch.inference_mode():
+            hidden = model(**inputs).last_hidden_state
+        mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        chunks.append(F.normalize(pooled, dim=-1))
+    return torch.cat(chunks)
+
+
+def bi_encode(pairs, model_name, batch_size):
+    # Encode each distinct sentence exactly once, then score all pairs with one gather + dot
+    index = {}
+    left, right = [], []
+    for p in pairs:
+        left.append(index.setdefault(p["sentence1"], len(index)))
+        right.append(index.setdefault(p["sentence2"], len(index)))
+
+    embeddings = encode_sentences(list(index), model_name, batch_size)
+    left, right = torch.tensor(left), torch.tensor(right)
+    scores = (embeddings[left] * embeddings[right]).sum(dim=-1)
+    return scores.tolist(), len(index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch sentence-pair similarity scoring")
+    parser.add_argument("--input", default="data/batch_input.json")
+    parser.add_argument("--output", default="outputs/batch_output.json")
+    parser.add_argument("--mode", choices=["cross", "bi"], default="cross",
+                        help="cross: fine-tuned cross-encoder on every pair; bi: cosine of cached sentence embeddings")
+    parser.add_argument("--model", default="./outputs", help="Fine-tuned cross-encoder")
+    parser.add_argument("--tokenizer", default="bert-base-uncased")
+    parser.add_argument("--bi-model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--rerank-top", type=int, default=0,
+                        help="bi mode: rescore the N highest-scoring pairs with the cross-encoder")
+    args = parser.parse_args()
+
+    with open(args.input) as f:
+        pairs = json.load(f)
+
+    start = time.perf_counter()
+    rerank_scores = {}
+    if args.mode == "cross":
+        scores = cross_encode(pairs, args.model, args.tokenizer, args.batch_size)
+        print(f"Cross-encoder scored {len(pairs)} pairs")
+    else:
+        scores, n_unique = bi_encode(pairs, args.bi_model, args.batch_size)
+        print(f"Bi-encoder scored {len(pairs)} pairs from {n_unique} unique sentences")
+        if args.rerank_top > 0:
+            top = torch.topk(torch.tensor(scores), k=min(args.rerank_top, len(pairs))).indices.tolist()
+            cross_scores = cross_encode([pairs[i] for i in top], args.model, args.tokenizer, args.batch_size)
+            rerank_scores = dict(zip(top, cross_scores))
+            print(f"Cross-encoder reranked top {len(top)} pairs")
+    elapsed = time.perf_counter() - start
+
+    # "score" always comes from the --mode model, so one file never mixes the cosine and
+    # cross-encoder (STS 0-5) scales. The cross-encoder output goes to "rerank_score", and
+    # "rank" orders the reranked top-N by it, followed by the remaining pairs by score.
+    results = [{"id": item["id"], "score": score} for item, score in zip(pairs, scores)]
+    if rerank_scores:
+        order = sorted(range(len(pairs)), key=lambda i: (i not in rerank_scores, -rerank_scores.get(i, scores[i])))
+        for rank, i in enumerate(order, 1):
+            results[i]["rank"] = rank
+        for i, score in rerank_scores.items():
+            results[i]["rerank_score"] = score
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"Batch inference complete in {elapsed:.2f} sec ({len(pairs) / elapsed:.1f} pairs/sec). Saved to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# batch_classifier.py — Classify many documents per prompt with bounded asyncio concurrency
+# Each prompt carries the few-shot examples once plus up to batch_size id-tagged documents.
+# Documents whose answer is missing or not a valid category are retried in a follow-up prompt.
+import asyncio
+import random
+from fewshot import CATEGORIES, build_batch_prompt, parse_labels
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_encoding = tiktoken.get_encoding("cl100k_base") if tiktoken is not None else None
+
+
+def count_tokens(text):
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1  # rough estimate without tiktoken
+
+
+class AsyncBatchClassifier:
+    def __init__(self, llm, examples, categories=CATEGORIES, batch_size=8, max_concurrency=4,
+                 max_retries=3, backoff=0.5, selector=None):
+        self.llm = llm  # any LangChain LLM / chat model (uses apredict)
+        self.examples = examples
+        self.selector = selector  # ExampleSelector: the k nearest examples per prompt instead of all of them
+        self.categories = list(categories)
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.stats = {"documents": 0, "prompts": 0, "prompt_tokens": 0, "retries": 0,
+                      "invalid_answers": 0, "errors": 0, "failed": 0}
+
+    async def _classify_batch(self, docs, semaphore):
+        # docs: [(doc_id, text)] -> [{"id", "label"}]; label is None when every attempt failed
+        results, pending, error = [], list(docs), None
+        examples = self.examples
+        if self.selector is not None:
+            examples = await asyncio.to_thread(self.selector.select_many, [text for _, text in docs])
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1) * (1 + random.random()))
+            prompt = build_batch_prompt([text for _, text in pending], examples, self.categories)
+            async with semaphore:
+                self.stats["prompts"] += 1
+                self.stats["prompt_tokens"] += count_tokens(prompt)
+                try:
+                    response = await self.llm.apredict(prompt)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    error = f"{type(e).__name__}: {e}"
+                    continue
+            labels, invalid = parse_labels(response, len(pending), self.categories)
+            self.stats["invalid_answers"] += invalid
+            results.extend({"id": doc_id, "label": labels[i]} for i, (doc_id, _) in enumerate(pending, 1) if i in labels)
+            pending = [doc for i, doc in enumerate(pending, 1) if i not in labels]
+            if not pending:
+                return results
+            error = "missing or invalid label"
+        self.stats["failed"] += len(pending)
+        return results + [{"id": doc_id, "label": None, "error": error} for doc_id, _ in pending]
+
+    async def classify(self, docs):
+        # docs: iterable of (doc_id, text); yields result lists as batches complete
+        docs = list(docs)
+        self.stats["documents"] += len(docs)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [asyncio.ensure_future(self._classify_batch(docs[i:i + self.batch_size], semaphore))
+                 for i in range(0, len(docs), self.batch_size)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def classify_all(self, docs):
+        # Synchronous helper; returns results in input order
+        async def collect():
+            return [r for batch in [b async for b in self.classify(docs)] for r in batch]
+        docs = list(docs)
+        by_id = {r["id"]: r for r in asyncio.run(collect())}
+        return [by_id[doc_id] for doc_id, _ in docs]
+
+    def summary(self, elapsed):
+        s = self.stats
+        per_doc = s["prompt_tokens"] / s["documents"] if s["documents"] else 0
+        return (f"{s['documents']} documents in {s['prompts']} prompts ({elapsed:.1f} sec, "
+                f"{s['documents'] / elapsed if elapsed else 0:.1f} docs/sec), {per_doc:.0f} prompt tokens/document; "
+                f"{s['retries']} retries, {s['invalid_answers']} invalid answers, {s['errors']} errors, {s['failed']} failed")
@@ -1,51 +1,61 @@
-# classify_batch.py
+# classify_batch.py — Classify a JSONL file of documents with batched few-shot prompts
 
-import os
+import argparse
+import asyncio
 import json
+import time
 from dotenv import load_dotenv
 from langchain.chat_models import ChatOpenAI
+from fewshot import CATEGORIES, load_examples
+from batch_classifier import AsyncBatchClassifier
+from example_selector import load_selector
+
+parser = argparse.ArgumentParser(description="Batch few-shot document classification")
+parser.add_argument("--input", default="docs.jsonl", help='One {"id": ..., "text": ...} object per line')
+parser.add_argument("--output", default="predictions.jsonl")
+parser.add_argument("--examples", default="fewshot_examples.json")
+parser.add_argument("--k", type=int, default=0, help="Nearest examples per prompt (0 = every example in --examples)")
+parser.add_argument("--balanced", action="store_true", help="Spread the k examples across labels")
+parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2")
+parser.add_argument("--batch-size", type=int, default=8, help="Documents per prompt")
+parser.add_argument("--concurrency", type=int, default=4, help="Prompts in flight")
+parser.add_argument("--retries", type=int, default=3)
+parser.add_argument("--model", default="gpt-3.5-turbo")
+parser.add_argument("--base-url", default=None, help="OpenAI-compatible endpoint, e.g. http://localhost:8009/v1 (fake_llm_server.py)")
+args = parser.parse_args()
 
 # Load model
 load_dotenv()
-llm = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0)
-
-# Load few-shot examples from JSON
-with open("fewshot_examples.json", "r") as f:
-    fewshot_examples = json.load(f)
-
-# Prompt template
-prompt_template = """
-You are an intelligent document classifier. Classify the following document into one of the categories: contract, invoice, medical_report, letter, insurance_form.
-
-Use the examples below for reference:
-
-{examples}
-
-Document:
-"""{doc}"""
-
-Label:
-"""
-
-example_blocks = "\n\n".join([
-    f"Document:\n{ex['text']}\nLabel: {ex['label']}"
-    for ex in fewshot_examples
-])
-
-def build_prompt(doc_text):
-    return prompt_template.format(examples=example_blocks, doc=doc_text)
-
-# Example test documents
-test_docs = [
-    "Policyholder: Jane Doe. Total amount claimed: $1200. Date of incident: 01/02/2024.",
-    "Invoice #78453. Due: September 30. Total due: $350.",
-    "Hello John, I hope you're doing well. I've attached the meeting notes."
-]
-
-print("\n🔍 Running Batch Classification\n")
-
-for i, doc in enumerate(test_docs, 1):
-    prompt = build_prompt(doc)
-    response = llm.predict(prompt).strip()
-    print(f"{i}. Document: {doc}\n   → Predicted Label: {response}\n")
-
+llm_kwargs = {"openai_api_base": args.base_url} if args.base_url else {}
+llm = ChatOpenAI(model_name=args.model, temperature=0, max_retries=0, **llm_kwargs)
+
+# Load documents; the line number is used when a line has no id
+with open(args.input, "r") as f:
+    records = [json.loads(line) for line in f if line.strip()]
+docs = [(str(r.get("id", n)), r["text"]) for n, r in enumerate(records, 1)]
+
+# Optionally select the nearest examples per prompt from an embedded example bank
+examples = load_examples(args.examples)
+selector = None
+if args.k:
+    selector = load_selector(args.examples, args.embedding_model, args.k, args.balanced)
+    print(f"Example bank: {len(examples)} examples ({selector.stats['embedded']} embedded, "
+          f"{selector.stats['cached']} from cache), {selector.k} per prompt")
+classifier = AsyncBatchClassifier(llm, examples, CATEGORIES, batch_size=args.batch_size,
+                                  max_concurrency=args.concurrency, max_retries=args.retries, selector=selector)
+
+
+async def main():
+    # Predictions are appended as each prompt completes
+    with open(args.output, "w") as f:
+        async for results in classifier.classify(docs):
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+            f.flush()
+
+
+print(f"\n🔍 Running Batch Classification on {len(docs)} documents\n")
+start = time.perf_counter()
+asyncio.run(main())
+print(f"✅ Predictions saved to {args.output}")
+print(classifier.summary(time.perf_counter() - start))
@@ -1,8 +1,11 @@
-# classify_batch.py
+# classify_fewshot.py
 
 import os
+import argparse
 from dotenv import load_dotenv
 from langchain.chat_models import ChatOpenAI
+from fewshot import build_prompt
+from example_selector import load_selector
 
 # Few-shot examples
 fewshot_examples = [
@@ -13,27 +16,13 @@ fewshot_examples = [
     {"text": "Claim ID: 78910. Policy Number: XZ-456. Claimed amount: $2000.", "label": "insurance_form"}
 ]
 
-# Prompt template
-prompt_template = """
-You are an intelligent document classifier. Classify the following document into one of the categories: contract, invoice, medical_report, letter, insurance_form.
-
-Use the examples below for reference:
-
-{examples}
-
-Document:
-"""{doc}"""
-
-Label:
-"""
-
-example_blocks = "\n\n".join([
-    f"Document:\n{ex['text']}\nLabel: {ex['label']}"
-    for ex in fewshot_examples
-])
-
-def build_prompt(doc_text):
-    return prompt_template.format(examples=example_blocks, doc=doc_text)
+parser = argparse.ArgumentParser(description="Few-shot classification of the example documents")
+parser.add_argument("--example-bank", default=None, help="JSON example bank to select the k nearest examples from")
+parser.add_argument("--k", type=int, default=4)
+parser.add_argument("--balanced", action="store_true", help="Spread the k examples across labels")
+parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2")
+args = parser.parse_args()
+selector = load_selector(args.example_bank, args.embedding_model, args.k, args.balanced) if args.example_bank else None
 
 # Load model
 load_dotenv()
@@ -49,7 +38,8 @@ test_docs = [
 print("\n🔍 Running Batch Classification\n")
 
 for i, doc in enumerate(test_docs, 1):
-    prompt = build_prompt(doc)
+    examples = selector.select(doc) if selector else fewshot_examples
+    prompt = build_prompt(doc, examples)
     response = llm.predict(prompt).strip()
     print(f"{i}. Document: {doc}\n   → Predicted Label: {response}\n")
 
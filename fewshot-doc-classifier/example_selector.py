@@ -0,0 +1,107 @@
+# example_selector.py — Pick the k nearest few-shot examples per document from an embedded example bank
+# Example embeddings are cached on disk by content hash, so a growing bank only embeds its new
+# entries; prompts then carry k examples no matter how large the bank gets.
+import hashlib
+import math
+import os
+import re
+from pathlib import Path
+import faiss
+import numpy as np
+from langchain.embeddings import SentenceTransformerEmbeddings
+from fewshot import load_examples
+
+
+def text_key(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def embedding_name(embeddings):
+    name = getattr(embeddings, "model_name", None) or getattr(embeddings, "model", None) or type(embeddings).__name__
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", str(name))
+
+
+def l2_normalize(x):
+    x = np.asarray(x, dtype=np.float32)
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+
+class ExampleSelector:
+    def __init__(self, examples, embeddings, k=4, balanced=False, cache_dir=".example_cache"):
+        # balanced: at most ceil(k / number of labels) examples per label, so one label
+        # cannot take every slot; slots left over are filled with the nearest remaining examples
+        self.examples = examples
+        self.embeddings = embeddings
+        self.k = min(k, len(examples))
+        self.balanced = balanced
+        self.labels = sorted({ex["label"] for ex in examples})
+        self.cache_path = Path(cache_dir) / f"{embedding_name(embeddings)}.npz"
+        self.stats = {"cached": 0, "embedded": 0}
+        vectors = self._bank_vectors()
+        self.index = faiss.IndexFlatIP(vectors.shape[1])
+        self.index.add(vectors)
+        # Balanced selection searches one sub-index per label, so a crowded label cannot hide the others
+        self.label_indexes = []
+        if balanced:
+            labels = np.array([ex["label"] for ex in examples])
+            for label in self.labels:
+                ids = np.flatnonzero(labels == label)
+                index = faiss.IndexFlatIP(vectors.shape[1])
+                index.add(vectors[ids])
+                self.label_indexes.append((ids, index))
+
+    def _bank_vectors(self):
+        cached = {}
+        if self.cache_path.exists():
+            with np.load(self.cache_path) as data:
+                cached = dict(zip(data["keys"].tolist(), data["vectors"]))
+        keys = [text_key(ex["text"]) for ex in self.examples]
+        missing = {key: ex["text"] for key, ex in zip(keys, self.examples) if key not in cached}
+        self.stats = {"cached": len(keys) - len(missing), "embedded": len(missing)}
+        if missing:
+            vectors = l2_normalize(self.embeddings.embed_documents(list(missing.values())))
+            cached.update(zip(missing, vectors))
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(".tmp.npz")
+            np.savez(tmp_path, keys=np.array(list(cached)), vectors=np.stack(list(cached.values())))
+            os.replace(tmp_path, self.cache_path)
+        return np.stack([cached[key] for key in keys])
+
+    def _pick(self, order):
+        # order: example ids, most preferred first (may repeat)
+        picked, counts = [], {}
+        cap = math.ceil(self.k / len(self.labels)) if self.balanced else self.k
+        for i in dict.fromkeys(order):
+            label = self.examples[i]["label"]
+            if counts.get(label, 0) < cap:
+                picked.append(i)
+                counts[label] = counts.get(label, 0) + 1
+                if len(picked) == self.k:
+                    return picked
+        rest = [i for i in dict.fromkeys(order) if i not in picked]
+        return picked + rest[:self.k - len(picked)]
+
+    def select_many(self, texts):
+        # Shared examples for a multi-document prompt: the documents' neighbour lists are
+        # interleaved (every document's nearest, then every second nearest, ...) and cut at k
+        if not self.k:
+            return []
+        queries = l2_normalize(self.embeddings.embed_documents(list(texts)))
+        if self.balanced:
+            cap = math.ceil(self.k / len(self.labels))
+            hits = [index.search(queries, min(cap, index.ntotal)) for _, index in self.label_indexes]
+            scores = np.hstack([s for s, _ in hits])
+            ids = np.hstack([label_ids[i] for (label_ids, _), (_, i) in zip(self.label_indexes, hits)])
+            ids = np.take_along_axis(ids, np.argsort(-scores, axis=1, kind="stable"), axis=1)
+        else:
+            _, ids = self.index.search(queries, self.k)
+        order = [int(i) for column in ids.T for i in column if i >= 0]
+        return [self.examples[i] for i in self._pick(order)]
+
+    def select(self, text):
+        return self.select_many([text])
+
+
+def load_selector(path="fewshot_examples.json", model_name="all-MiniLM-L6-v2", k=4, balanced=False,
+                  cache_dir=".example_cache"):
+    return ExampleSelector(load_examples(path), SentenceTransformerEmbeddings(model_name=model_name), k, balanced, cache_dir)
@@ -0,0 +1,90 @@
+# fake_llm_server.py — Local stand-in for an OpenAI-compatible /v1/chat/completions endpoint
+# Labels documents with keyword rules and answers in the batch format of fewshot.py. Rate limits,
+# server errors, dropped answers and out-of-set labels can be injected to exercise the retry and
+# validation paths of batch_classifier.py without an API key.
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from aiohttp import web
+
+RULES = [
+    ("insurance_form", ["claim", "policy", "policyholder", "incident"]),
+    ("invoice", ["invoice", "amount due", "total due", "bill to", "payable"]),
+    ("medical_report", ["diagnosis", "patient", "treatment", "prescribed"]),
+    ("contract", ["agreement", "parties", "entered into", "term of"]),
+    ("letter", ["dear", "hello", "sincerely", "regards"]),
+]
+DOCUMENT = re.compile(r'<document id="([^"]+)">\n(.*?)\n</document>', re.S)
+
+
+def keyword_label(text):
+    text = text.lower()
+    return max(RULES, key=lambda rule: sum(k in text for k in rule[1]))[0]
+
+
+def make_app(latency=0.2, rate_limit=0.0, error_rate=0.0, drop_rate=0.0, invalid_rate=0.0):
+    stats = {"requests": 0, "documents": 0, "rate_limited": 0, "errors": 0, "dropped": 0, "invalid": 0}
+
+    async def chat_completions(request):
+        stats["requests"] += 1
+        body = await request.json()
+        prompt = body["messages"][-1]["content"]
+        await asyncio.sleep(latency)
+        roll = random.random()
+        if roll < rate_limit:
+            stats["rate_limited"] += 1
+            return web.json_response({"error": {"message": "rate limited"}}, status=429, headers={"Retry-After": "0.1"})
+        if roll < rate_limit + error_rate:
+            stats["errors"] += 1
+            return web.json_response({"error": {"message": "server error"}}, status=500)
+
+        docs = DOCUMENT.findall(prompt)
+        if docs:
+            lines = []
+            for doc_id, text in docs:
+                roll = random.random()
+                if roll < drop_rate:
+                    stats["dropped"] += 1
+                    continue
+                label = "receipt" if roll < drop_rate + invalid_rate else keyword_label(text)
+                stats["invalid"] += label == "receipt"
+                lines.append(json.dumps({"id": doc_id, "label": label}))
+            content = "\n".join(lines)
+        else:  # single-document prompt
+            doc = prompt.rsplit('"""', 2)[-2] if prompt.count('"""') >= 2 else prompt
+            docs, content = [doc], keyword_label(doc)
+        stats["documents"] += len(docs)
+
+        prompt_tokens = len(prompt) // 4 + 1
+        return web.json_response({
+            "id": f"chatcmpl-{stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4 + 1,
+                      "total_tokens": prompt_tokens + len(content) // 4 + 1},
+        })
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application(client_max_size=16 * 1024 ** 2)
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8009)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per request")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Fraction of documents left out of the answer")
+    parser.add_argument("--invalid-rate", type=float, default=0.0, help="Fraction of documents given an unknown label")
+    args = parser.parse_args()
+    web.run_app(make_app(args.latency, args.rate_limit, args.error_rate, args.drop_rate, args.invalid_rate), port=args.port)
@@ -0,0 +1,73 @@
+# fewshot.py — Few-shot prompt building and response parsing shared by the classifier scripts
+import json
+import re
+
+CATEGORIES = ["contract", "invoice", "medical_report", "letter", "insurance_form"]
+
+PROMPT_TEMPLATE = '''
+You are an intelligent document classifier. Classify the following document into one of the categories: {categories}.
+
+Use the examples below for reference:
+
+{examples}
+
+Document:
+"""{doc}"""
+
+Label:
+'''
+
+# Several documents share one copy of the examples; answers are tagged with the document id
+BATCH_PROMPT_TEMPLATE = '''
+You are an intelligent document classifier. Classify each document below into one of the categories: {categories}.
+
+Use the examples below for reference:
+
+{examples}
+
+Documents:
+{docs}
+
+Answer with exactly one JSON object per line, one line per document, and nothing else:
+{{"id": "<document id>", "label": "<category>"}}
+'''
+
+
+def load_examples(path="fewshot_examples.json"):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def format_examples(examples):
+    return "\n\n".join(f"Document:\n{ex['text']}\nLabel: {ex['label']}" for ex in examples)
+
+
+def build_prompt(doc_text, examples, categories=CATEGORIES):
+    return PROMPT_TEMPLATE.format(categories=", ".join(categories), examples=format_examples(examples), doc=doc_text)
+
+
+def build_batch_prompt(doc_texts, examples, categories=CATEGORIES):
+    # Documents get short positional ids ("1", "2", ...) to keep the prompt and the answer small
+    docs = "\n".join(f'<document id="{i}">\n{text}\n</document>' for i, text in enumerate(doc_texts, 1))
+    return BATCH_PROMPT_TEMPLATE.format(categories=", ".join(categories), examples=format_examples(examples), docs=docs)
+
+
+def normalize_label(label):
+    return re.sub(r"[\s-]+", "_", str(label).strip().strip("`'\".").lower())
+
+
+def parse_labels(response, n_docs, categories=CATEGORIES):
+    # Returns ({doc id: label} for valid answers, number of answers with an unknown id or label)
+    labels, invalid = {}, 0
+    for match in re.finditer(r"\{[^{}]*\}", response):
+        try:
+            item = json.loads(match.group())
+            doc_id, label = str(item["id"]).strip(), normalize_label(item["label"])
+        except (ValueError, KeyError, TypeError):
+            invalid += 1
+            continue
+        if label in categories and doc_id.isdigit() and 1 <= int(doc_id) <= n_docs:
+            labels.setdefault(int(doc_id), label)
+        else:
+            invalid += 1
+    return labels, invalid
@@ -1,40 +1,19 @@
 # streamlit_app.py
 
 import os
-import json
 import streamlit as st
 from dotenv import load_dotenv
 from langchain.chat_models import ChatOpenAI
+from fewshot import load_examples, build_prompt
+from langchain.embeddings import SentenceTransformerEmbeddings
+from example_selector import ExampleSelector
 
 # Load environment variables
 load_dotenv()
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
 # Load few-shot examples from JSON
-with open("fewshot_examples.json", "r") as f:
-    fewshot_examples = json.load(f)
-
-# Prepare prompt template
-prompt_template = """
-You are an intelligent document classifier. Classify the following document into one of the categories: contract, invoice, medical_report, letter, insurance_form.
-
-Use the examples below for reference:
-
-{examples}
-
-Document:
-"""{doc}"""
-
-Label:
-"""
-
-example_blocks = "\n\n".join([
-    f"Document:\n{ex['text']}\nLabel: {ex['label']}"
-    for ex in fewshot_examples
-])
-
-def build_prompt(doc_text):
-    return prompt_template.format(examples=example_blocks, doc=doc_text)
+fewshot_examples = load_examples("fewshot_examples.json")
 
 # Initialize LLM
 llm = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0, openai_api_key=openai_api_key)
@@ -44,6 +23,24 @@ st.set_page_config(page_title="Few-Shot Document Classifier", layout="centered")
 st.title("🧠 Few-Shot Document Classifier")
 st.markdown("Classify text into contract, invoice, letter, etc. using GPT-3.5 and few-shot prompts.")
 
+# Sidebar: choose the k nearest examples per document instead of the whole example bank
+st.sidebar.header("⚙️ Few-shot examples")
+use_selector = st.sidebar.checkbox("Select nearest examples", value=False)
+k = st.sidebar.slider("Examples per prompt (k)", 1, 10, 4, disabled=not use_selector)
+balanced = st.sidebar.checkbox("Balance labels", value=False, disabled=not use_selector)
+
+
+@st.cache_resource
+def get_embeddings():
+    return SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+
+
+@st.cache_resource
+def get_selector(k, balanced):
+    # Bank embeddings come from the on-disk cache after the first build
+    return ExampleSelector(fewshot_examples, get_embeddings(), k, balanced)
+
+
 input_text = st.text_area("📄 Paste a document snippet below:", height=200)
 
 if st.button("🔍 Classify"):
@@ -51,7 +48,8 @@ if st.button("🔍 Classify"):
         st.warning("Please enter a document snippet to classify.")
     else:
         with st.spinner("Classifying with GPT-3.5..."):
-            prompt = build_prompt(input_text)
+            examples = get_selector(k, balanced).select(input_text) if use_selector else fewshot_examples
+            prompt = build_prompt(input_text, examples)
             prediction = llm.predict(prompt).strip()
             st.success(f"**Predicted Label:** `{prediction}`")
             with st.expander("🔍 View Prompt"):
@@ -30,14 +30,15 @@ def parse_funsd_json(json_path, image_size=(1000, 1000)):
 
     for block in data['form']:
         label = block.get('label', 'other').upper()
-        text_label = 'KEY' if label == 'KEY' else 'VALUE' if label == 'VALUE' else 'OTHER'
+        # FUNSD tags blocks as question/answer/header/other
+        text_label = 'KEY' if label in ('KEY', 'QUESTION') else 'VALUE' if label in ('VALUE', 'ANSWER') else 'OTHER'
 
         if not block['words']:
             continue
 
         for idx, word in enumerate(block['words']):
             tag = f"{'B' if idx == 0 else 'I'}-{text_label}"
-            words.append(word)
+            words.append(word['text'] if isinstance(word, dict) else word)
             boxes.append(normalize_box(block['box'], *image_size))
             labels.append(label2id.get(tag, 0))
 
@@ -1,36 +1,132 @@
+import glob
+import json
+import os
 import torch
 from PIL import Image
 from transformers import DonutProcessor, VisionEncoderDecoderModel
 import re
 
-def infer_donut(image_path, question):
-    processor = DonutProcessor.from_pretrained('naver-clova-ix/donut-base-finetuned-docvqa')
-    model = VisionEncoderDecoderModel.from_pretrained('naver-clova-ix/donut-base-finetuned-docvqa')
-    model.eval()
+DEFAULT_MODEL = 'naver-clova-ix/donut-base-finetuned-docvqa'
+DEFAULT_QUESTION = "What are the key fields and their values?"
+
+
+def parse_kv_pairs(decoded):
+    return re.findall(r'\"(.*?)\"\s*:\s*\"(.*?)\"', decoded)
+
+
+class DonutExtractor:
+    # Keeps the processor and model resident; pages are encoded once per batch and the
+    # encoder outputs are reused for every question asked about them
+    def __init__(self, model_name=DEFAULT_MODEL, device=None, max_length=512):
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.processor = DonutProcessor.from_pretrained(model_name)
+        self.model = VisionEncoderDecoderModel.from_pretrained(model_name).to(self.device)
+        self.model.eval()
+        self.max_length = max_length
+
+    def prompt_ids(self, question, batch_size):
+        task_prompt = f"<s_docvqa><s_question>{question}<s_answer>"
+        ids = self.processor.tokenizer(task_prompt, add_special_tokens=False, return_tensors='pt').input_ids
+        return ids.repeat(batch_size, 1).to(self.device)
+
+    def generate(self, pixel_values, questions=(DEFAULT_QUESTION,)):
+        # Runs the encoder once and returns the generated ids for each question
+        generated = []
+        with torch.inference_mode():
+            encoder_outputs = self.model.encoder(pixel_values=pixel_values.to(self.device))
+            for question in questions:
+                generated.append(self.model.generate(
+                    encoder_outputs=encoder_outputs,
+                    decoder_input_ids=self.prompt_ids(question, len(pixel_values)),
+                    max_length=self.max_length,
+                    pad_token_id=self.processor.tokenizer.pad_token_id,
+                    eos_token_id=self.processor.tokenizer.eos_token_id,
+                    use_cache=True,
+                ))
+        return generated
+
+    def decode(self, outputs, question):
+        # One result dict per generated sequence
+        tokenizer = self.processor.tokenizer
+        results = []
+        for i, sequence in enumerate(self.processor.batch_decode(outputs)):
+            sequence = sequence.replace(tokenizer.eos_token, "").replace(tokenizer.pad_token, "")
+            sequence = re.sub(r"<.*?>", "", sequence, count=1).strip()  # drop the task start token
+            answer = self.processor.token2json(sequence).get("answer", "")
+            decoded = tokenizer.decode(outputs[i], skip_special_tokens=True)
+            results.append({
+                "question": question,
+                "answer": answer,
+                "raw": decoded,
+                "kv_pairs": parse_kv_pairs(decoded),
+            })
+        return results
 
-    image = Image.open(image_path).convert("RGB")
-    pixel_values = processor(images=image, return_tensors="pt").pixel_values
+    def extract(self, images, questions=(DEFAULT_QUESTION,)):
+        # images: list of PIL images. Returns one dict per (image, question), image-major.
+        pixel_values = self.processor(images=images, return_tensors="pt").pixel_values
+        generated = self.generate(pixel_values, questions)
+        per_question = [self.decode(outputs, question) for question, outputs in zip(questions, generated)]
+        return [list(results) for results in zip(*per_question)]
 
-    task_prompt = f"<s_docvqa><s_question>{question}<s_answer>"
-    inputs = processor.tokenizer(task_prompt, return_tensors='pt')
+    def extract_files(self, image_paths, questions=(DEFAULT_QUESTION,), batch_size=4):
+        # Yields (path, [result per question]) for each image, batch_size pages per generate call
+        for start in range(0, len(image_paths), batch_size):
+            paths = image_paths[start:start + batch_size]
+            images = [Image.open(p).convert("RGB") for p in paths]
+            yield from zip(paths, self.extract(images, questions))
 
-    with torch.no_grad():
-        outputs = model.generate(pixel_values, decoder_input_ids=inputs.input_ids, max_length=512)
 
-    decoded = processor.batch_decode(outputs, skip_special_tokens=True)[0]
+_extractor = None
+
+
+def infer_donut(image_path, question):
+    # Single-image helper; the extractor is created on first use and kept resident
+    global _extractor
+    if _extractor is None:
+        _extractor = DonutExtractor()
+    result = _extractor.extract([Image.open(image_path).convert("RGB")], [question])[0][0]
+
     print("\n🔍 Raw Output:")
-    print(decoded)
+    print(result["raw"])
 
     print("\n🔑 Extracted Key-Value Pairs:")
-    kv_pairs = re.findall(r'\"(.*?)\"\s*:\s*\"(.*?)\"', decoded)
-    for key, value in kv_pairs:
+    for key, value in result["kv_pairs"]:
         print(f"{key.strip()} --> {value.strip()}")
 
+
+def resolve_images(pattern):
+    # A directory (all PNG/JPG files inside) or a glob pattern
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        return sorted(p for p in paths if p.lower().endswith(('.png', '.jpg', '.jpeg', '.tif', '.tiff')))
+    return sorted(glob.glob(pattern))
+
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
-    parser.add_argument("--image", type=str, required=True, help="Path to form image")
-    parser.add_argument("--question", type=str, default="What are the key fields and their values?", help="Document QA prompt")
+    parser.add_argument("--image", type=str, default=None, help="Path to form image")
+    parser.add_argument("--images", type=str, default=None, help="Directory or glob of form images (batch mode)")
+    parser.add_argument("--question", type=str, action="append", help="Document QA prompt (repeat for several questions)")
+    parser.add_argument("--output", type=str, default="donut_predictions.jsonl", help="JSONL output for batch mode")
+    parser.add_argument("--batch-size", type=int, default=4, help="Images per generate call")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL)
+    parser.add_argument("--max-length", type=int, default=512, help="Maximum generated sequence length")
     args = parser.parse_args()
+    questions = args.question or [DEFAULT_QUESTION]
 
-    infer_donut(args.image, args.question)
+    if args.images:
+        image_paths = resolve_images(args.images)
+        extractor = DonutExtractor(args.model, max_length=args.max_length)
+        with open(args.output, "w") as f:
+            for path, results in extractor.extract_files(image_paths, questions, args.batch_size):
+                for result in results:
+                    f.write(json.dumps({"image": path, **result}) + "\n")
+        print(f"✅ Processed {len(image_paths)} images x {len(questions)} questions → {args.output}")
+    elif args.image:
+        _extractor = DonutExtractor(args.model, max_length=args.max_length)
+        for question in questions:
+            infer_donut(args.image, question)
+    else:
+        parser.error("one of --image or --images is required")
@@ -1,84 +1,243 @@
+import argparse
 import json
+import multiprocessing
 import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from PIL import Image
-from transformers import DonutProcessor, VisionEncoderDecoderModel
+import numpy as np
 import torch
-import re
-from layoutlm_dataset import load_funsd_labels, extract_layoutlm_kv_pairs
-from data_preprocessing import process_sample
-from sklearn.metrics import precision_score, recall_score, f1_score
+from PIL import Image
+from transformers import DonutProcessor, LayoutLMForTokenClassification, LayoutLMTokenizerFast
+from data_preprocessing import parse_funsd_json, id2label
+from donut_infer import DonutExtractor, DEFAULT_MODEL, DEFAULT_QUESTION
+from layoutlm_dataset import tokenize_funsd_sample, DynamicPaddingCollator
+
+STAGES = ("load", "preprocess", "inference", "parse")
+MODELS = ("layoutlm", "donut")
+
+
+def normalize_pair(key, value):
+    return f"{key.strip().lower()}:{value.strip().lower()}"
+
+
+def block_text(block):
+    if block.get('text'):
+        return block['text']
+    return " ".join(w['text'] if isinstance(w, dict) else w for w in block.get('words', []))
+
+
+def load_funsd_labels(label_path):
+    # Ground-truth "key:value" strings from the question -> answer links of a FUNSD form
+    with open(label_path) as f:
+        form = json.load(f)['form']
+    blocks = {b['id']: b for b in form if 'id' in b}
+    roles = {'question': 'key', 'key': 'key', 'answer': 'value', 'value': 'value'}
+    pairs = set()
+    for block in form:
+        for a, b in block.get('linking', []):
+            if a in blocks and b in blocks:
+                if (roles.get(blocks[a]['label']), roles.get(blocks[b]['label'])) == ('key', 'value'):
+                    pairs.add(normalize_pair(block_text(blocks[a]), block_text(blocks[b])))
+    return pairs
+
+
+def layoutlm_kv_pairs(words, tag_ids):
+    # Groups B-/I- word tags into KEY/VALUE spans and pairs each key with the value that follows it
+    spans, current = [], None
+    for word, tag in zip(words, tag_ids):
+        prefix, _, kind = id2label.get(tag, 'O').partition('-')
+        if kind != current or prefix == 'B':
+            spans.append((kind, []))
+        spans[-1][1].append(word)
+        current = kind
+
+    pairs, key = set(), None
+    for kind, span in spans:
+        if kind == 'KEY':
+            key = " ".join(span)
+        elif kind == 'VALUE' and key is not None:
+            pairs.add(normalize_pair(key, " ".join(span)))
+            key = None
+    return pairs
+
+
+# --- Preprocessing workers ---
+_worker = {}
+
 
-def infer_donut(image_path, question, processor, model):
+def init_worker(models, donut_model, layoutlm_tokenizer, max_length):
+    torch.set_num_threads(1)
+    if 'donut' in models:
+        _worker['image_processor'] = DonutProcessor.from_pretrained(donut_model).image_processor
+    if 'layoutlm' in models:
+        _worker['tokenizer'] = LayoutLMTokenizerFast.from_pretrained(layoutlm_tokenizer)
+    _worker['max_length'] = max_length
+
+
+def prepare_sample(image_path, label_path):
+    # Runs in a worker process: decodes/parses the inputs and builds the model inputs for each model
+    sample = {'id': Path(image_path).stem, 'gold': load_funsd_labels(label_path), 'timings': defaultdict(dict)}
+    t0 = time.perf_counter()
     image = Image.open(image_path).convert("RGB")
-    pixel_values = processor(images=image, return_tensors="pt").pixel_values
-    prompt = f"<s_docvqa><s_question>{question}<s_answer>"
-    inputs = processor.tokenizer(prompt, return_tensors='pt')
-    with torch.no_grad():
-        outputs = model.generate(pixel_values, decoder_input_ids=inputs.input_ids, max_length=512)
-    decoded = processor.batch_decode(outputs, skip_special_tokens=True)[0]
-    return re.findall(r'\"(.*?)\"\s*:\s*\"(.*?)\"', decoded)
-
-def evaluate_models(image_dir, label_dir, n=5):
-    layoutlm_preds = []
-    donut_preds = []
-    ground_truths = []
-
-    # Load Donut model
-    donut_processor = DonutProcessor.from_pretrained("naver-clova-ix/donut-base-finetuned-docvqa")
-    donut_model = VisionEncoderDecoderModel.from_pretrained("naver-clova-ix/donut-base-finetuned-docvqa")
-    donut_model.eval()
+    t1 = time.perf_counter()
 
-    image_files = sorted(Path(image_dir).glob("*.png"))[:n]
+    if 'image_processor' in _worker:
+        sample['pixel_values'] = _worker['image_processor'](image, return_tensors="pt").pixel_values[0]
+        sample['timings']['donut'].update(load=t1 - t0, preprocess=time.perf_counter() - t1)
+
+    if 'tokenizer' in _worker:
+        t0 = time.perf_counter()
+        words = parse_funsd_json(label_path, image.size)
+        t1 = time.perf_counter()
+        encoded = tokenize_funsd_sample(words, _worker['tokenizer'], _worker['max_length'])
+        sample['words'] = words['words']
+        sample['layoutlm'] = {name: torch.from_numpy(arr.astype(np.int64)) for name, arr in encoded.items()}
+        sample['timings']['layoutlm'].update(load=t1 - t0, preprocess=time.perf_counter() - t1)
+    return sample
 
-    for image_path in image_files:
-        sample_id = image_path.stem
-        label_path = Path(label_dir) / f"{sample_id}.json"
 
-        # Get ground truth
-        gt_kv = load_funsd_labels(label_path)
+def pipelined(executor, jobs, prefetch):
+    # Keeps up to `prefetch` samples in flight and yields them in input order
+    jobs = iter(jobs)
+    pending = deque()
+    for job in jobs:
+        pending.append(executor.submit(prepare_sample, *job))
+        if len(pending) >= prefetch:
+            break
+    while pending:
+        sample = pending.popleft().result()
+        for job in jobs:
+            pending.append(executor.submit(prepare_sample, *job))
+            break
+        yield sample
 
-        # Inference — LayoutLM
-        layoutlm_kv = extract_layoutlm_kv_pairs(sample_id)
 
-        # Inference — Donut
-        start = time.time()
-        donut_kv = infer_donut(str(image_path), "What are the key fields and their values?", donut_processor, donut_model)
-        end = time.time()
-        donut_time = end - start
+def batches(samples, size):
+    batch = []
+    for sample in samples:
+        batch.append(sample)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
-        # Format predictions
-        gt_pairs = [f"{k.strip().lower()}:{v.strip().lower()}" for k, v in gt_kv.items()]
-        layoutlm_pairs = [f"{k.strip().lower()}:{v.strip().lower()}" for k, v in layoutlm_kv.items()]
-        donut_pairs = [f"{k.strip().lower()}:{v.strip().lower()}" for k, v in donut_kv]
 
-        ground_truths.append(gt_pairs)
-        layoutlm_preds.append(layoutlm_pairs)
-        donut_preds.append(donut_pairs)
+def run_layoutlm(model, collator, batch):
+    # Batch inference time is shared equally across the forms in the batch
+    features = [s['layoutlm'] for s in batch]
+    t0 = time.perf_counter()
+    inputs = {k: v.to(model.device) for k, v in collator(features).items()}
+    labels = inputs.pop('labels')
+    with torch.inference_mode():
+        preds = model(**inputs).logits.argmax(dim=-1)
+    first_piece = (labels != -100).cpu()
+    preds = preds.cpu()
+    inference = (time.perf_counter() - t0) / len(batch)
 
-        print(f"🧾 {sample_id}")
-        print(f" - Donut Inference Time: {donut_time:.2f} sec")
+    for i, sample in enumerate(batch):
+        t0 = time.perf_counter()
+        sample['pred_layoutlm'] = layoutlm_kv_pairs(sample['words'], preds[i][first_piece[i]].tolist())
+        sample['timings']['layoutlm'].update(inference=inference, parse=time.perf_counter() - t0)
 
-    def compute_f1(preds, golds):
-        y_true, y_pred = [], []
-        for gt, pred in zip(golds, preds):
-            all_keys = set(gt + pred)
-            y_true.extend([1 if x in gt else 0 for x in all_keys])
-            y_pred.extend([1 if x in pred else 0 for x in all_keys])
-        precision = precision_score(y_true, y_pred)
-        recall = recall_score(y_true, y_pred)
-        f1 = f1_score(y_true, y_pred)
-        return precision, recall, f1
 
-    layoutlm_metrics = compute_f1(layoutlm_preds, ground_truths)
-    donut_metrics = compute_f1(donut_preds, ground_truths)
+def run_donut(extractor, question, batch):
+    t0 = time.perf_counter()
+    outputs = extractor.generate(torch.stack([s['pixel_values'] for s in batch]), [question])[0]
+    inference = (time.perf_counter() - t0) / len(batch)
+
+    t0 = time.perf_counter()
+    results = extractor.decode(outputs, question)
+    parse = (time.perf_counter() - t0) / len(batch)
+    for sample, result in zip(batch, results):
+        sample['pred_donut'] = {normalize_pair(k, v) for k, v in result['kv_pairs']}
+        sample['timings']['donut'].update(inference=inference, parse=parse)
+
+
+def precision_recall_f1(tp, n_pred, n_gold):
+    precision = tp / n_pred if n_pred else 0.0
+    recall = tp / n_gold if n_gold else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+def evaluate_models(image_dir, label_dir, n=None, models=MODELS, workers=4, prefetch=8, batch_size=4,
+                    donut_model=DEFAULT_MODEL, layoutlm_model="outputs/layoutlm",
+                    layoutlm_tokenizer="microsoft/layoutlm-base-uncased", question=DEFAULT_QUESTION,
+                    max_length=512, donut_max_length=512):
+    image_files = sorted(Path(image_dir).glob("*.png"))[:n]
+    jobs = [(str(p), str(Path(label_dir) / f"{p.stem}.json")) for p in image_files]
+
+    if 'layoutlm' in models:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        layoutlm = LayoutLMForTokenClassification.from_pretrained(layoutlm_model).to(device)
+        layoutlm.eval()
+        collator = DynamicPaddingCollator(LayoutLMTokenizerFast.from_pretrained(layoutlm_tokenizer).pad_token_id)
+    if 'donut' in models:
+        donut = DonutExtractor(donut_model, max_length=donut_max_length)
+
+    # Workers load and preprocess upcoming forms while the models run on the current batch
+    counts = {m: np.zeros(3, dtype=np.int64) for m in models}  # true positives, predicted, gold
+    timings = {m: defaultdict(list) for m in models}
+    start = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker,
+                             initargs=(models, donut_model, layoutlm_tokenizer, max_length)) as executor:
+        for batch in batches(pipelined(executor, jobs, prefetch), batch_size):
+            if 'layoutlm' in models:
+                run_layoutlm(layoutlm, collator, batch)
+            if 'donut' in models:
+                run_donut(donut, question, batch)
+
+            for sample in batch:
+                for m in models:
+                    pred, gold = sample[f'pred_{m}'], sample['gold']
+                    counts[m] += (len(pred & gold), len(pred), len(gold))
+                    for stage in STAGES:
+                        timings[m][stage].append(sample['timings'][m][stage])
+                print(f"🧾 {sample['id']}: " + ", ".join(
+                    f"{m} {sum(sample['timings'][m].values()):.2f} sec" for m in models))
+    elapsed = time.perf_counter() - start
+
+    print(f"\n⏱️ {len(jobs)} forms in {elapsed:.1f} sec ({len(jobs) / elapsed:.2f} forms/sec, {workers} workers)")
+    for m in models:
+        name = {'layoutlm': 'LayoutLM', 'donut': 'Donut'}[m]
+        print("\n📊 {:<8} — Precision: {:.2f}, Recall: {:.2f}, F1: {:.2f}".format(name, *precision_recall_f1(*counts[m])))
+        for stage in STAGES:
+            p50, p95 = np.percentile(timings[m][stage], [50, 95]) if timings[m][stage] else (0.0, 0.0)
+            print(f"   {stage:<10} p50: {p50 * 1000:8.1f} ms   p95: {p95 * 1000:8.1f} ms")
 
-    print("\n📊 LayoutLM — Precision: {:.2f}, Recall: {:.2f}, F1: {:.2f}".format(*layoutlm_metrics))
-    print("📊 Donut     — Precision: {:.2f}, Recall: {:.2f}, F1: {:.2f}".format(*donut_metrics))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipelined LayoutLM vs Donut key-value extraction benchmark on FUNSD")
+    parser.add_argument("--images", type=str, default="data/images")
+    parser.add_argument("--annotations", type=str, default="data/annotations")
+    parser.add_argument("--n", type=int, default=None, help="Only evaluate the first n forms (default: all)")
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=list(MODELS))
+    parser.add_argument("--workers", type=int, default=4, help="Processes loading and preprocessing forms")
+    parser.add_argument("--prefetch", type=int, default=8, help="Forms prepared ahead of inference")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--donut-model", type=str, default=DEFAULT_MODEL)
+    parser.add_argument("--layoutlm-model", type=str, default="outputs/layoutlm")
+    parser.add_argument("--layoutlm-tokenizer", type=str, default="microsoft/layoutlm-base-uncased")
+    parser.add_argument("--question", type=str, default=DEFAULT_QUESTION)
+    parser.add_argument("--max-length", type=int, default=512, help="LayoutLM sequence length")
+    parser.add_argument("--donut-max-length", type=int, default=512, help="Maximum Donut generated length")
+    args = parser.parse_args()
+
     evaluate_models(
-        image_dir="data/images",
-        label_dir="data/annotations",
-        n=5
+        image_dir=args.images,
+        label_dir=args.annotations,
+        n=args.n,
+        models=tuple(args.models),
+        workers=args.workers,
+        prefetch=max(args.prefetch, args.batch_size),
+        batch_size=args.batch_size,
+        donut_model=args.donut_model,
+        layoutlm_model=args.layoutlm_model,
+        layoutlm_tokenizer=args.layoutlm_tokenizer,
+        question=args.question,
+        max_length=args.max_length,
+        donut_max_length=args.donut_max_length,
     )
@@ -1,4 +1,9 @@
+import json
+import os
+import numpy as np
+import torch
 from torch.utils.data import Dataset
+from PIL import Image
 from transformers import LayoutLMTokenizerFast
 from data_preprocessing import parse_funsd_json
 
@@ -28,3 +33,147 @@ class FUNSDDataset(Dataset):
         labels = item['labels'][:self.max_length] + [0] * (self.max_length - len(item['labels']))
         encoding['labels'] = labels
         return encoding
+
+
+# --- Pre-tokenized, memory-mapped FUNSD cache ---
+# Every sample's tokens are concatenated into flat arrays; offsets[i]:offsets[i + 1] is sample i.
+CACHE_ARRAYS = {
+    'input_ids': (np.int32, ()),
+    'bbox': (np.int16, (4,)),
+    'labels': (np.int16, ()),
+}
+
+
+def tokenize_funsd_sample(sample, tokenizer, max_length=512):
+    # Word boxes are expanded to every wordpiece; only the first piece of a word carries
+    # its label (-100 elsewhere). [CLS] gets the empty box and [SEP] the full-page box.
+    encoding = tokenizer(sample['words'], truncation=True, max_length=max_length, is_split_into_words=True)
+    input_ids = np.asarray(encoding['input_ids'], dtype=np.int32)
+    word_ids = np.array([-1 if w is None else w for w in encoding.word_ids()])
+    words = word_ids >= 0
+
+    bbox = np.zeros((len(input_ids), 4), dtype=np.int16)
+    bbox[input_ids == tokenizer.sep_token_id] = 1000
+    if words.any():
+        bbox[words] = np.asarray(sample['boxes'], dtype=np.int16)[word_ids[words]]
+
+    labels = np.full(len(input_ids), -100, dtype=np.int16)
+    first_piece = words & (word_ids != np.concatenate([[-1], word_ids[:-1]]))
+    labels[first_piece] = np.asarray(sample['labels'], dtype=np.int16)[word_ids[first_piece]]
+    return {'input_ids': input_ids, 'bbox': bbox, 'labels': labels}
+
+
+def funsd_image_path(annotation_path, image_dir=None):
+    # FUNSD keeps <split>/annotations/<id>.json next to <split>/images/<id>.png
+    if image_dir is None:
+        image_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(annotation_path))), 'images')
+    return os.path.join(image_dir, os.path.splitext(os.path.basename(annotation_path))[0] + '.png')
+
+
+def build_funsd_cache(file_paths, cache_dir, tokenizer_name='microsoft/layoutlm-base-uncased', max_length=512,
+                      image_dir=None):
+    # Parses and tokenizes each annotation once, appending to raw arrays on disk.
+    # Boxes are scaled to LayoutLM's 0-1000 range by each form's own image size
+    # (only the image header is read).
+    os.makedirs(cache_dir, exist_ok=True)
+    tokenizer = LayoutLMTokenizerFast.from_pretrained(tokenizer_name)
+    files = {name: open(os.path.join(cache_dir, f'{name}.bin'), 'wb') for name in CACHE_ARRAYS}
+    offsets, image_sizes = [0], []
+    for path in file_paths:
+        with Image.open(funsd_image_path(path, image_dir)) as image:
+            size = image.size
+        image_sizes.append(list(size))
+        encoded = tokenize_funsd_sample(parse_funsd_json(path, size), tokenizer, max_length)
+        for name, f in files.items():
+            encoded[name].tofile(f)
+        offsets.append(offsets[-1] + len(encoded['input_ids']))
+    for f in files.values():
+        f.close()
+
+    np.save(os.path.join(cache_dir, 'offsets.npy'), np.asarray(offsets, dtype=np.int64))
+    meta = {
+        'tokenizer_name': tokenizer_name,
+        'max_length': max_length,
+        'num_samples': len(offsets) - 1,
+        'num_tokens': offsets[-1],
+        'files': [str(p) for p in file_paths],
+        'bbox_scale': 'image_size',
+        'image_dir': image_dir,
+        'image_sizes': image_sizes,
+        'pad_token_id': tokenizer.pad_token_id,
+    }
+    with open(os.path.join(cache_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class FUNSDMemmapDataset(Dataset):
+    # Reads samples from a build_funsd_cache() directory. The arrays are opened lazily in
+    # each process, so DataLoader workers share the OS page cache instead of each
+    # receiving a pickled copy of the dataset.
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.offsets = np.load(os.path.join(cache_dir, 'offsets.npy'))
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_arrays'] = None
+        return state
+
+    def _open(self):
+        n_tokens = self.meta['num_tokens']
+        self._arrays = {}
+        for name, (dtype, shape) in CACHE_ARRAYS.items():
+            if n_tokens:
+                path = os.path.join(self.cache_dir, f'{name}.bin')
+                self._arrays[name] = np.memmap(path, dtype=dtype, mode='r', shape=(n_tokens,) + shape)
+            else:
+                self._arrays[name] = np.empty((0,) + shape, dtype=dtype)
+
+    def __getitem__(self, idx):
+        if self._arrays is None:
+            self._open()
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return {name: torch.from_numpy(np.array(arr[start:end], dtype=np.int64)) for name, arr in self._arrays.items()}
+
+
+class DynamicPaddingCollator:
+    # Pads each batch only to its own longest sequence
+    def __init__(self, pad_token_id=0, label_pad_id=-100):
+        self.pad_values = {'input_ids': pad_token_id, 'bbox': 0, 'labels': label_pad_id}
+
+    def __call__(self, features):
+        lengths = [len(f['input_ids']) for f in features]
+        max_len = max(lengths)
+        batch = {}
+        for name, pad_value in self.pad_values.items():
+            first = features[0][name]
+            padded = first.new_full((len(features), max_len) + tuple(first.shape[1:]), pad_value)
+            for i, f in enumerate(features):
+                padded[i, :lengths[i]] = f[name]
+            batch[name] = padded
+        batch['attention_mask'] = (torch.arange(max_len)[None, :] < torch.tensor(lengths)[:, None]).long()
+        return batch
+
+
+if __name__ == "__main__":
+    import argparse
+    from pathlib import Path
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--annotations", type=str, default="data/annotations", help="Directory of FUNSD JSON annotations")
+    parser.add_argument("--images", type=str, default=None,
+                        help="Directory of the form images (default: the images/ folder next to --annotations)")
+    parser.add_argument("--cache-dir", type=str, default="data/funsd_cache", help="Output directory for the memory-mapped cache")
+    parser.add_argument("--tokenizer", type=str, default="microsoft/layoutlm-base-uncased")
+    parser.add_argument("--max-length", type=int, default=512)
+    args = parser.parse_args()
+
+    meta = build_funsd_cache(sorted(Path(args.annotations).glob("*.json")), args.cache_dir, args.tokenizer, args.max_length,
+                             args.images)
+    print(f"✅ Cached {meta['num_samples']} forms ({meta['num_tokens']} tokens) in {args.cache_dir}")
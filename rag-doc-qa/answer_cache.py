@@ -0,0 +1,146 @@
+# answer_cache.py — Exact-match LLM answer cache for RetrievalQA with an on-disk SQLite backend
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from langchain.schema import format_document
+
+
+def prompt_template_text(prompt):
+    # PromptTemplate has .template; chat prompts are a list of message templates
+    if hasattr(prompt, "template"):
+        return prompt.template
+    if hasattr(prompt, "messages"):
+        return "\n".join(getattr(getattr(m, "prompt", None), "template", repr(m)) for m in prompt.messages)
+    return repr(prompt)
+
+
+def llm_model_name(llm):
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+
+
+def doc_id(doc):
+    # chunk_id (from ingest.py) is path/page/position based and survives an in-place PDF edit,
+    # so the chunk text is always hashed in; an edited chunk can never hit an old answer
+    content = hashlib.sha1(f"{doc.metadata.get('source')}\0{doc.page_content}".encode()).hexdigest()
+    if "chunk_id" in doc.metadata:
+        return f"{doc.metadata['chunk_id']}:{content[:16]}"
+    return content
+
+
+def answer_key(model_name, template, query, chunk_ids):
+    return hashlib.sha256(json.dumps([model_name, template, query, list(chunk_ids)]).encode()).hexdigest()
+
+
+class AnswerCache:
+    # Entries expire after ttl seconds; once stored answers exceed max_bytes, the least
+    # recently used ones are evicted. Safe to share between threads.
+    def __init__(self, path="vectorstore/answer_cache.sqlite", ttl=7 * 24 * 3600, max_bytes=64 * 1024 ** 2):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, answer TEXT, size INTEGER, created REAL, accessed REAL, latency REAL)"
+        )
+        self._db.commit()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "saved_seconds": 0.0}
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT answer, created, latency FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM answers WHERE key = ?", (key,))
+                self._db.commit()
+                self.stats["expired"] += 1
+                row = None
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._db.execute("UPDATE answers SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.stats["hits"] += 1
+            self.stats["saved_seconds"] += row[2]
+            return row[0]
+
+    def put(self, key, answer, latency):
+        # latency: seconds the LLM call took, credited as saved on every later hit
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?)",
+                (key, answer, len(answer.encode()), now, now, latency),
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM answers").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in self._db.execute("SELECT key, size FROM answers ORDER BY accessed"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM answers WHERE key = ?", stale)
+        self.stats["evicted"] += len(stale)
+
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def summary(self):
+        return (f"Answer cache: {self.stats['hits']} hits, {self.stats['misses']} misses "
+                f"({self.hit_rate():.0%} hit rate), {self.stats['saved_seconds']:.1f} sec of LLM time saved")
+
+
+class CachedRetrievalQA:
+    # Wraps a "stuff" RetrievalQA chain: retrieval always runs, and the LLM is only called when
+    # (model, prompt template, query, retrieved chunk ids) has not been answered before.
+    # Called like the chain: qa({"query": ...}) -> {"query", "result", "source_documents"}, plus
+    # "timings" (seconds for retrieval / prompt / llm) and "cached". With cache=None every query
+    # goes to the LLM.
+    def __init__(self, qa_chain, cache=None):
+        self.qa_chain = qa_chain
+        self.cache = cache
+        self.combine_chain = qa_chain.combine_documents_chain
+        self.llm_chain = self.combine_chain.llm_chain
+        self.model_name = llm_model_name(self.llm_chain.llm)
+        self.template = prompt_template_text(self.llm_chain.prompt)
+
+    def build_prompt(self, query, docs):
+        # Same prompt StuffDocumentsChain would send
+        context = self.combine_chain.document_separator.join(
+            format_document(doc, self.combine_chain.document_prompt) for doc in docs
+        )
+        return self.llm_chain.prompt.format_prompt(**{self.combine_chain.document_variable_name: context, "question": query})
+
+    def __call__(self, inputs):
+        query = inputs["query"]
+        timings = {"retrieval": 0.0, "prompt": 0.0, "llm": 0.0}
+        start = time.perf_counter()
+        docs = self.qa_chain.retriever.get_relevant_documents(query)
+        timings["retrieval"] = time.perf_counter() - start
+
+        key = answer_key(self.model_name, self.template, query, [doc_id(d) for d in docs])
+        answer = self.cache.get(key) if self.cache is not None else None
+        cached = answer is not None
+        if not cached:
+            start = time.perf_counter()
+            prompt = self.build_prompt(query, docs)
+            timings["prompt"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            answer = self.llm_chain.llm.generate_prompt([prompt]).generations[0][0].text
+            timings["llm"] = time.perf_counter() - start
+            if self.cache is not None:
+                self.cache.put(key, answer, timings["llm"])
+        return {"query": query, "result": answer, "source_documents": docs, "timings": timings, "cached": cached}
@@ -1,22 +1,13 @@
-from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.embeddings import OpenAIEmbeddings
-from langchain.vectorstores import FAISS
 from langchain.chains import RetrievalQA
 from langchain.chat_models import ChatOpenAI
 import os
 
-# Load PDF
-loader = PyPDFLoader("data/contract.pdf")
-pages = loader.load()
+from index_store import IndexStore
 
-# Split text
-splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-docs = splitter.split_documents(pages)
-
-# Embed & Store
+# Load, split & embed the PDF (reused from vectorstore/cache when unchanged)
 embedding_model = OpenAIEmbeddings()
-vectordb = FAISS.from_documents(docs, embedding_model)
+vectordb = IndexStore(embedding_model, chunk_size=500, chunk_overlap=50).vectorstore(["data/contract.pdf"])
 
 # Create retriever + QA chain
 retriever = vectordb.as_retriever()
@@ -0,0 +1,119 @@
+# context_packing.py — Merge overlapping chunks, drop near-duplicates and pack retrieved context into a token budget
+import logging
+from typing import Any, List
+from langchain.schema import BaseRetriever, Document
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger("context_packing")
+_encoding = tiktoken.get_encoding("cl100k_base") if tiktoken is not None else None
+
+
+def count_tokens(text):
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1  # rough estimate without tiktoken
+
+
+def overlap_length(a, b, min_overlap=20):
+    # Length of the longest suffix of a that is a prefix of b (the splitter's chunk_overlap region)
+    probe = b[:min_overlap]
+    if len(probe) < min_overlap:
+        return 0
+    pos = a.find(probe)
+    while pos != -1:
+        if b.startswith(a[pos:]):
+            return len(a) - pos
+        pos = a.find(probe, pos + 1)
+    return 0
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def assemble_context(docs, token_budget=1500, min_overlap=20, dedup_threshold=0.9):
+    # docs: retriever output, best first. Returns (packed docs, stats).
+    groups = []  # {"text", "key", "members"} in order of their best-ranked member
+    for doc in docs:
+        text = doc.page_content
+        key = (doc.metadata.get("source"), doc.metadata.get("page"))
+        for group in groups:
+            if group["key"] != key:
+                continue
+            if text in group["text"]:
+                break
+            n = overlap_length(group["text"], text, min_overlap)
+            if n:
+                group["text"] += text[n:]
+                break
+            n = overlap_length(text, group["text"], min_overlap)
+            if n:
+                group["text"] = text + group["text"][n:]
+                break
+        else:
+            groups.append({"text": text, "key": key, "members": [doc]})
+            continue
+        group["members"].append(doc)
+
+    # Near-duplicates (e.g. the same clause repeated on another page) keep only the best-ranked copy
+    kept, kept_tokens = [], []
+    for group in groups:
+        tokens = set(group["text"].lower().split())
+        if all(jaccard(tokens, other) < dedup_threshold for other in kept_tokens):
+            kept.append(group)
+            kept_tokens.append(tokens)
+
+    # Greedy packing in rank order; the top group is always kept so the context is never empty
+    packed, used = [], 0
+    for group in kept:
+        n_tokens = count_tokens(group["text"])
+        if packed and used + n_tokens > token_budget:
+            continue
+        members = group["members"]
+        metadata = dict(members[0].metadata)
+        if len(members) > 1:
+            ids = [m.metadata.get("chunk_id") for m in members]
+            if all(ids):
+                metadata["chunk_id"] = "+".join(ids)
+            metadata["merged_chunks"] = len(members)
+        packed.append(Document(page_content=group["text"], metadata=metadata))
+        used += n_tokens
+
+    stats = {
+        "chunks_in": len(docs),
+        "chunks_out": len(packed),
+        "tokens_in": sum(count_tokens(d.page_content) for d in docs),
+        "tokens_out": used,
+    }
+    stats["tokens_saved"] = stats["tokens_in"] - stats["tokens_out"]
+    return packed, stats
+
+
+class ContextPackingRetriever(BaseRetriever):
+    # Wraps any retriever; per-query stats are logged and kept in self.history
+    retriever: Any
+    token_budget: int = 1500
+    min_overlap: int = 20
+    dedup_threshold: float = 0.9
+    history: list = []
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query, *, run_manager=None) -> List[Document]:
+        docs = self.retriever.get_relevant_documents(query)
+        packed, stats = assemble_context(docs, self.token_budget, self.min_overlap, self.dedup_threshold)
+        self.history.append({"query": query, **stats})
+        logger.info(f"Context for {query!r}: {stats['chunks_in']} chunks / {stats['tokens_in']} tokens → "
+                    f"{stats['chunks_out']} / {stats['tokens_out']} ({stats['tokens_saved']} tokens saved)")
+        return packed
+
+    def summary(self):
+        tokens_in = sum(h["tokens_in"] for h in self.history)
+        saved = sum(h["tokens_saved"] for h in self.history)
+        return (f"Context packing: {saved} of {tokens_in} retrieved tokens saved "
+                f"({saved / tokens_in if tokens_in else 0:.0%}) over {len(self.history)} queries")
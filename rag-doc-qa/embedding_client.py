@@ -0,0 +1,178 @@
+# embedding_client.py — Async, rate-limited, token-aware batched embedding client with checkpoint/resume
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+import aiohttp
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def text_key(model, text):
+    return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+
+def pack_batches(token_counts, max_tokens, max_inputs):
+    # Greedy in input order: a batch closes when the next text would exceed either limit.
+    # A text longer than max_tokens is sent on its own.
+    batch, batch_tokens = [], 0
+    for index, n_tokens in enumerate(token_counts):
+        if batch and (batch_tokens + n_tokens > max_tokens or len(batch) == max_inputs):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(index)
+        batch_tokens += n_tokens
+    if batch:
+        yield batch
+
+
+class EmbeddingCheckpoint:
+    # Append-only JSONL, one line per completed request: {"keys": [...], "vectors": base64 float32}.
+    # A torn last line from an interrupted run is truncated away on load.
+    def __init__(self, path):
+        self.path = path
+        self.vectors = {}
+        valid = 0
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    if not line.endswith(b"\n"):
+                        break
+                    vectors = np.frombuffer(base64.b64decode(record["vectors"]), dtype=np.float32)
+                    self.vectors.update(zip(record["keys"], vectors.reshape(len(record["keys"]), -1)))
+                    valid += len(line)
+            os.truncate(path, valid)
+        elif os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a")
+
+    def add(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self._file.write(json.dumps({"keys": keys, "vectors": base64.b64encode(vectors.tobytes()).decode()}) + "\n")
+        self._file.flush()
+        self.vectors.update(zip(keys, vectors))
+
+
+class AsyncEmbeddingClient(Embeddings):
+    # LangChain Embeddings backed by an OpenAI-compatible /embeddings endpoint. Texts are packed
+    # into token-bounded requests, sent by max_concurrency workers, and retried with exponential
+    # backoff (honouring Retry-After) on 429/5xx and connection errors. With checkpoint_path,
+    # every completed request is persisted, so a rerun only embeds what is still missing.
+    def __init__(self, model="text-embedding-ada-002", base_url=None, api_key=None, max_concurrency=4,
+                 max_batch_tokens=8000, max_batch_inputs=256, requests_per_minute=None, max_retries=8,
+                 timeout=60, checkpoint_path=None):
+        self.model = model
+        self.base_url = (base_url or os.getenv("OPENAI_API_BASE") or "https://api.openai.com/v1").rstrip("/")
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY", "")
+        self.max_concurrency = max_concurrency
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.requests_per_minute = requests_per_minute
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.checkpoint = EmbeddingCheckpoint(checkpoint_path) if checkpoint_path else None
+        self.stats = {"requests": 0, "retries": 0, "tokens": 0, "from_checkpoint": 0}
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count_tokens(self, text):
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return len(text) // 4 + 1  # rough estimate without tiktoken
+
+    async def _throttle(self):
+        # Spaces request starts evenly when requests_per_minute is set
+        if not self.requests_per_minute:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_request - now
+            self._next_request = max(now, self._next_request) + 60 / self.requests_per_minute
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _post(self, session, inputs):
+        for attempt in range(self.max_retries + 1):
+            await self._throttle()
+            retry_after = None
+            try:
+                self.stats["requests"] += 1
+                async with session.post(f"{self.base_url}/embeddings", json={"model": self.model, "input": inputs}) as resp:
+                    if resp.status == 200:
+                        data = (await resp.json())["data"]
+                        return [d["embedding"] for d in sorted(data, key=lambda d: d["index"])]
+                    if resp.status not in RETRY_STATUS:
+                        raise RuntimeError(f"Embedding request failed ({resp.status}): {await resp.text()}")
+                    retry_after = resp.headers.get("Retry-After")
+                    error = RuntimeError(f"Embedding request failed ({resp.status}) after {self.max_retries} retries")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+            if attempt == self.max_retries:
+                raise error
+            self.stats["retries"] += 1
+            delay = float(retry_after) if retry_after else min(60.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+            await asyncio.sleep(delay)
+
+    async def aembed_documents(self, texts):
+        keys = [text_key(self.model, t) for t in texts]
+        vectors = {}
+        if self.checkpoint is not None:
+            vectors.update((k, self.checkpoint.vectors[k]) for k in set(keys) if k in self.checkpoint.vectors)
+            self.stats["from_checkpoint"] += len(vectors)
+        todo = list(dict.fromkeys(k for k in keys if k not in vectors))
+        text_of = dict(zip(keys, texts))
+
+        token_counts = [self.count_tokens(text_of[k]) for k in todo]
+        batches = pack_batches(token_counts, self.max_batch_tokens, self.max_batch_inputs)
+        self._lock = asyncio.Lock()
+        self._next_request = time.monotonic()
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+        async with aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+            async def worker():
+                # Workers share one batch generator, so at most max_concurrency requests are in flight
+                for batch in batches:
+                    batch_keys = [todo[i] for i in batch]
+                    embedded = await self._post(session, [text_of[k] for k in batch_keys])
+                    vectors.update(zip(batch_keys, embedded))
+                    self.stats["tokens"] += sum(token_counts[i] for i in batch)
+                    if self.checkpoint is not None:
+                        self.checkpoint.add(batch_keys, embedded)
+
+            await asyncio.gather(*(worker() for _ in range(self.max_concurrency)))
+        return [np.asarray(vectors[k], dtype=np.float32).tolist() for k in keys]
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+    def embed_documents(self, texts):
+        coro = self.aembed_documents(list(texts))
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+        # Called from inside an event loop (e.g. a notebook): run on a private loop in a thread
+        with ThreadPoolExecutor(1) as executor:
+            return executor.submit(asyncio.run, coro).result()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
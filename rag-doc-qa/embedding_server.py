@@ -0,0 +1,56 @@
+# embedding_server.py — Local stand-in for an OpenAI-compatible /v1/embeddings endpoint
+# Vectors are deterministic per text, and rate limits / server errors can be injected to
+# exercise the retry, backoff and checkpoint paths of embedding_client.py without an API key.
+import argparse
+import asyncio
+import hashlib
+import random
+import numpy as np
+from aiohttp import web
+
+
+def fake_embedding(text, dim):
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def make_app(dim=1536, latency=0.05, rate_limit=0.0, error_rate=0.0, max_inputs=2048):
+    stats = {"requests": 0, "inputs": 0, "rate_limited": 0, "errors": 0}
+
+    async def embeddings(request):
+        stats["requests"] += 1
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        if len(inputs) > max_inputs:
+            return web.json_response({"error": {"message": f"too many inputs ({len(inputs)})"}}, status=400)
+        await asyncio.sleep(latency)
+        roll = random.random()
+        if roll < rate_limit:
+            stats["rate_limited"] += 1
+            return web.json_response({"error": {"message": "rate limited"}}, status=429, headers={"Retry-After": "0.1"})
+        if roll < rate_limit + error_rate:
+            stats["errors"] += 1
+            return web.json_response({"error": {"message": "server error"}}, status=500)
+        stats["inputs"] += len(inputs)
+        data = [{"object": "embedding", "index": i, "embedding": fake_embedding(t, dim)} for i, t in enumerate(inputs)]
+        return web.json_response({"object": "list", "data": data, "model": body.get("model")})
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application(client_max_size=64 * 1024 ** 2)
+    app.router.add_post("/v1/embeddings", embeddings)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per request")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    args = parser.parse_args()
+    web.run_app(make_app(args.dim, args.latency, args.rate_limit, args.error_rate), port=args.port)
@@ -0,0 +1,162 @@
+# hybrid_retriever.py — BM25 inverted index (compact CSR postings) + lexical-pruned dense reranking with RRF
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from typing import Any, List
+import numpy as np
+from langchain.schema import BaseRetriever, Document
+
+# Keeps identifiers such as "CL-2024-001937", "99213" or "500mg" intact as whole tokens
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+
+
+def tokenize(text):
+    # Compound identifiers also emit their parts, so "CL-2024-001937" matches "001937"
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        parts = re.split(r"[-./]", token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    # Postings are stored CSR-style: term t's documents are doc_ids[indptr[t]:indptr[t + 1]],
+    # with the full BM25 term weight precomputed per posting, so a query is a gather + bincount.
+    def __init__(self, vocab, indptr, doc_ids, weights, n_docs, fingerprint=None):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.n_docs = n_docs
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, texts, k1=1.5, b=0.75, fingerprint=None):
+        doc_terms = [Counter(tokenize(t)) for t in texts]
+        vocab = {}
+        for terms in doc_terms:
+            for term in terms:
+                vocab.setdefault(term, len(vocab))
+
+        lengths = np.array([sum(terms.values()) for terms in doc_terms], dtype=np.float32)
+        avg_len = lengths.mean() if len(lengths) else 0.0
+        rows = [(vocab[term], d, tf) for d, terms in enumerate(doc_terms) for term, tf in terms.items()]
+        term_ids, doc_ids, tfs = (np.array(col) for col in zip(*rows)) if rows else (np.empty(0, np.int64),) * 3
+
+        order = np.lexsort((doc_ids, term_ids))
+        term_ids, doc_ids, tfs = term_ids[order], doc_ids[order].astype(np.int32), tfs[order].astype(np.float32)
+        df = np.bincount(term_ids, minlength=len(vocab))
+        indptr = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+
+        idf = np.log(1 + (len(texts) - df + 0.5) / (df + 0.5))
+        norm = k1 * (1 - b + b * lengths[doc_ids] / max(avg_len, 1e-9))
+        weights = (idf[term_ids] * tfs * (k1 + 1) / (tfs + norm)).astype(np.float32)
+        return cls(vocab, indptr, doc_ids, weights, len(texts), fingerprint)
+
+    def search(self, query, k=10):
+        # Returns (doc ids, scores) of the top-k documents sharing at least one term with the query
+        term_ids = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not term_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        postings = np.concatenate([np.arange(self.indptr[t], self.indptr[t + 1]) for t in term_ids])
+        scores = np.bincount(self.doc_ids[postings], weights=self.weights[postings], minlength=self.n_docs)
+        matched = np.flatnonzero(scores)
+        top = matched[np.argsort(-scores[matched], kind="stable")[:k]]
+        return top, scores[top]
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.savez(os.path.join(path, "postings.npz"), indptr=self.indptr, doc_ids=self.doc_ids, weights=self.weights)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"vocab": self.vocab, "n_docs": self.n_docs, "fingerprint": self.fingerprint}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = np.load(os.path.join(path, "postings.npz"))
+        return cls(meta["vocab"], arrays["indptr"], arrays["doc_ids"], arrays["weights"], meta["n_docs"], meta["fingerprint"])
+
+
+def vectorstore_fingerprint(vectorstore):
+    # Docstore ids are path/page/position based and survive an in-place PDF edit, so the
+    # chunk texts are hashed too; a persisted index is reused only for identical rows.
+    digest = hashlib.sha256()
+    for i in range(vectorstore.index.ntotal):
+        doc_id = vectorstore.index_to_docstore_id[i]
+        digest.update(f"{doc_id}\0".encode())
+        digest.update(vectorstore.docstore.search(doc_id).page_content.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def vectorstore_documents(vectorstore):
+    # Documents in FAISS row order, so BM25 doc ids and FAISS ids coincide
+    return [vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]) for i in range(vectorstore.index.ntotal)]
+
+
+def bm25_for_vectorstore(vectorstore, path=None):
+    # Loads the persisted index at path if it was built over the same FAISS rows, else builds (and saves) it
+    fingerprint = vectorstore_fingerprint(vectorstore)
+    if path and os.path.exists(os.path.join(path, "meta.json")):
+        index = BM25Index.load(path)
+        if index.fingerprint == fingerprint:
+            return index
+    index = BM25Index.build([d.page_content for d in vectorstore_documents(vectorstore)], fingerprint=fingerprint)
+    if path:
+        index.save(path)
+    return index
+
+
+class HybridRetriever(BaseRetriever):
+    # BM25 hits select up to `candidates` chunks; only those are scored densely (no full
+    # vector scan), then lexical and dense ranks are fused with reciprocal-rank fusion.
+    # Queries with fewer than k lexical hits fall back to a regular dense search for the rest.
+    vectorstore: Any
+    bm25: Any
+    k: int = 4
+    candidates: int = 50
+    rrf_k: int = 60
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def dense_scores(self, query_vector, ids):
+        vectors = self.vectorstore.index.reconstruct_batch(ids)
+        if self.vectorstore.distance_strategy.value in ("MAX_INNER_PRODUCT", "DOT_PRODUCT", "COSINE"):
+            return vectors @ query_vector
+        return -((vectors - query_vector) ** 2).sum(axis=1)
+
+    def _get_relevant_documents(self, query, *, run_manager=None) -> List[Document]:
+        query_vector = np.asarray(self.vectorstore._embed_query(query), dtype=np.float32)
+        if self.vectorstore._normalize_L2:
+            query_vector /= np.linalg.norm(query_vector)
+        lexical_ids, _ = self.bm25.search(query, self.candidates)
+
+        fused = {}
+        if len(lexical_ids):
+            dense_order = lexical_ids[np.argsort(-self.dense_scores(query_vector, lexical_ids), kind="stable")]
+            for rank, i in enumerate(lexical_ids):
+                fused[int(i)] = 1 / (self.rrf_k + rank + 1)
+            for rank, i in enumerate(dense_order):
+                fused[int(i)] += 1 / (self.rrf_k + rank + 1)
+        if len(fused) < self.k:
+            _, dense_ids = self.vectorstore.index.search(query_vector[None, :], self.k + len(fused))
+            for rank, i in enumerate(i for i in dense_ids[0] if i >= 0 and int(i) not in fused):
+                fused[int(i)] = 1 / (self.rrf_k + len(lexical_ids) + rank + 1)
+
+        top = sorted(fused, key=fused.get, reverse=True)[:self.k]
+        docs = []
+        for i in top:
+            doc = self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[i])
+            docs.append(Document(page_content=doc.page_content, metadata={**doc.metadata, "rrf_score": fused[i]}))
+        return docs
+
+
+def hybrid_retriever(vectorstore, bm25_path=None, **kwargs):
+    # Drop-in for vectorstore.as_retriever(); kwargs: k, candidates, rrf_k
+    return HybridRetriever(vectorstore=vectorstore, bm25=bm25_for_vectorstore(vectorstore, bm25_path), **kwargs)
@@ -0,0 +1,150 @@
+# index_store.py — Persistent per-PDF chunk + embedding cache keyed by file content hash and config
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+import numpy as np
+from langchain.schema import Document
+from langchain.vectorstores import FAISS
+from ingest import ChunkStream, chunk_id
+
+# Bump when chunk/vector layout changes so old entries are not reused
+CACHE_VERSION = 2
+
+
+def file_hash(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def embedding_name(embeddings):
+    # e.g. "OpenAIEmbeddings:text-embedding-ada-002"
+    model = getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None)
+    return f"{type(embeddings).__name__}:{model}"
+
+
+class IndexStore:
+    # Layout: <cache_dir>/<config key>/<pdf sha256>/{chunks.jsonl, vectors.npy}
+    # The config key covers the embedding model and chunking settings, so changing either
+    # starts a fresh namespace while unchanged PDFs are never parsed or embedded twice.
+    def __init__(self, embeddings, cache_dir="vectorstore/cache", chunk_size=500, chunk_overlap=50,
+                 workers=None, batch_size=256):
+        self.embeddings = embeddings
+        self.workers = workers
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        config = {
+            "version": CACHE_VERSION,
+            "embedding": embedding_name(embeddings),
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+        }
+        key = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+        self.root = Path(cache_dir) / key
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / "config.json", "w") as f:
+            json.dump(config, f, indent=2)
+        self.manifest_path = self.root / "manifest.json"
+        self.stats = {"cached": 0, "embedded": 0, "pages": 0, "pages_per_sec": 0.0}
+
+    def _load_manifest(self):
+        # path -> {size, mtime_ns, hash}; lets warm starts skip re-hashing unchanged files
+        if self.manifest_path.exists():
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        return {}
+
+    def _save_manifest(self, manifest):
+        tmp = self.manifest_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self.manifest_path)
+
+    def content_hash(self, path, manifest):
+        stat = os.stat(path)
+        entry = manifest.get(str(path))
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["hash"]
+        digest = file_hash(path)
+        manifest[str(path)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest}
+        return digest
+
+    def read_entry(self, path, digest):
+        entry = self.root / digest
+        with open(entry / "chunks.jsonl") as f:
+            chunks = [Document(**json.loads(line)) for line in f]
+        # The same content may live under another name; sources and ids always reflect the current path
+        page, index = None, 0
+        for chunk in chunks:
+            index = index + 1 if chunk.metadata["page"] == page else 0
+            page = chunk.metadata["page"]
+            chunk.metadata["source"] = str(path)
+            chunk.metadata["chunk_id"] = chunk_id(str(path), page, index)
+        return chunks, np.load(entry / "vectors.npy")
+
+    def ingest(self, missing):
+        # Parses uncached PDFs in a process pool and embeds the chunk stream batch by batch;
+        # each file's entry is written as soon as its last chunk has been embedded
+        stream = ChunkStream([path for path, _ in missing], self.chunk_size, self.chunk_overlap,
+                             self.batch_size, self.workers)
+        digests = dict(missing)
+        current, chunks, vectors = None, [], []
+        for batch in stream:
+            batch_vectors = np.asarray(self.embeddings.embed_documents([c.page_content for c in batch]), dtype=np.float32)
+            for chunk, vector in zip(batch, batch_vectors):
+                source = chunk.metadata["source"]
+                if source != current:
+                    if current is not None:
+                        self._write_entry(self.root / digests.pop(current), chunks, np.stack(vectors))
+                    current, chunks, vectors = source, [], []
+                chunks.append(chunk)
+                vectors.append(vector)
+        if current is not None:
+            self._write_entry(self.root / digests.pop(current), chunks, np.stack(vectors))
+        for digest in digests.values():  # PDFs without any text
+            self._write_entry(self.root / digest, [], np.empty((0,), dtype=np.float32))
+
+        self.stats["embedded"] += len(missing)
+        self.stats["pages"] += stream.stats["pages"]
+        self.stats["pages_per_sec"] = stream.pages_per_sec()
+
+    def _write_entry(self, entry, chunks, vectors):
+        tmp = entry.with_name(entry.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        with open(tmp / "chunks.jsonl", "w") as f:
+            for chunk in chunks:
+                f.write(json.dumps({"page_content": chunk.page_content, "metadata": chunk.metadata}) + "\n")
+        np.save(tmp / "vectors.npy", vectors)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+
+    def vectorstore(self, paths):
+        # FAISS store over all given PDFs, built from cached vectors (no embedding calls when warm)
+        paths = sorted(str(p) for p in paths)
+        manifest = self._load_manifest()
+        digests = [self.content_hash(path, manifest) for path in paths]
+        self._save_manifest(manifest)
+        missing = [(path, digest) for path, digest in zip(paths, digests) if not (self.root / digest).is_dir()]
+        if missing:
+            # Identical files are parsed and embedded once
+            self.ingest([(path, digest) for digest, path in {d: p for p, d in missing}.items()])
+        self.stats["cached"] += len(paths) - len(missing)
+
+        texts, vectors, metadatas = [], [], []
+        for path, digest in zip(paths, digests):
+            chunks, file_vectors = self.read_entry(path, digest)
+            if chunks:
+                texts.extend(c.page_content for c in chunks)
+                metadatas.extend(c.metadata for c in chunks)
+                vectors.append(file_vectors)
+
+        if not texts:
+            raise ValueError(f"No text chunks found in {len(paths)} PDF(s)")
+        ids = [m["chunk_id"] for m in metadatas]
+        return FAISS.from_embeddings(zip(texts, np.concatenate(vectors)), self.embeddings, metadatas=metadatas, ids=ids)
@@ -0,0 +1,106 @@
+# ingest.py — Parallel, page-range PDF parsing + chunking that streams chunks in bounded batches
+import argparse
+import hashlib
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from pypdf import PdfReader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.schema import Document
+
+
+def chunk_id(source, page, index):
+    # Stable across runs and worker counts: derived only from the file path, page and position
+    return f"{hashlib.sha1(source.encode()).hexdigest()[:12]}-p{page}-c{index}"
+
+
+def count_pages(path):
+    return len(PdfReader(path).pages)
+
+
+def parse_pages(path, start, end, chunk_size, chunk_overlap):
+    # Runs in a worker: extracts pages [start, end) and splits each page on its own, matching
+    # PyPDFLoader + split_documents (metadata: source, page)
+    reader = PdfReader(path)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = []
+    for page in range(start, end):
+        text = reader.pages[page].extract_text()
+        for i, piece in enumerate(splitter.split_text(text)):
+            metadata = {"source": path, "page": page, "chunk_id": chunk_id(path, page, i)}
+            chunks.append(Document(page_content=piece, metadata=metadata))
+    return chunks
+
+
+def plan_tasks(paths, page_counts, pages_per_task):
+    # Large files are split into page ranges so a single big PDF is spread over several workers
+    for path, n_pages in zip(paths, page_counts):
+        for start in range(0, n_pages, pages_per_task):
+            yield path, start, min(start + pages_per_task, n_pages)
+
+
+class ChunkStream:
+    # Iterating yields lists of at most batch_size chunks, in file/page order regardless of
+    # which worker finishes first. At most max_pending page ranges are parsed ahead of the consumer.
+    def __init__(self, paths, chunk_size=500, chunk_overlap=50, batch_size=256, workers=None,
+                 pages_per_task=32, max_pending=None):
+        self.paths = [str(p) for p in paths]
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count()
+        self.pages_per_task = pages_per_task
+        self.max_pending = max_pending or 2 * self.workers
+        self.stats = {"files": len(self.paths), "pages": 0, "chunks": 0, "seconds": 0.0}
+
+    def __iter__(self):
+        start = time.perf_counter()
+        with ProcessPoolExecutor(self.workers) as executor:
+            page_counts = list(executor.map(count_pages, self.paths, chunksize=16))
+            tasks = plan_tasks(self.paths, page_counts, self.pages_per_task)
+            pending = deque()
+            batch = []
+            while True:
+                while len(pending) < self.max_pending:
+                    task = next(tasks, None)
+                    if task is None:
+                        break
+                    pending.append((task, executor.submit(parse_pages, *task, self.chunk_size, self.chunk_overlap)))
+                if not pending:
+                    break
+                (_, first, last), future = pending.popleft()
+                self.stats["pages"] += last - first
+                for chunk in future.result():
+                    batch.append(chunk)
+                    if len(batch) == self.batch_size:
+                        self.stats["chunks"] += len(batch)
+                        self.stats["seconds"] = time.perf_counter() - start
+                        yield batch
+                        batch = []
+            if batch:
+                self.stats["chunks"] += len(batch)
+                yield batch
+        self.stats["seconds"] = time.perf_counter() - start
+
+    def pages_per_sec(self):
+        return self.stats["pages"] / self.stats["seconds"] if self.stats["seconds"] else 0.0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse and chunk PDFs in parallel (no embedding)")
+    parser.add_argument("data_dir", nargs="?", default="data")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--chunk-overlap", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--pages-per-task", type=int, default=32)
+    args = parser.parse_args()
+
+    stream = ChunkStream(sorted(Path(args.data_dir).glob("*.pdf")), args.chunk_size, args.chunk_overlap,
+                         args.batch_size, args.workers, args.pages_per_task)
+    n_batches = sum(1 for _ in stream)
+    print(f"Parsed {stream.stats['pages']} pages from {stream.stats['files']} PDFs into "
+          f"{stream.stats['chunks']} chunks ({n_batches} batches)")
+    print(f"  - Pages/sec: {stream.pages_per_sec():.1f} with {stream.workers} workers")
@@ -0,0 +1,55 @@
+# query_runner.py — Concurrent RAG query runner with per-stage latency percentiles
+import csv
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+STAGES = ("retrieval", "prompt", "llm", "total")
+
+
+def timed_query(qa, query):
+    start = time.perf_counter()
+    result = qa({"query": query})
+    timings = dict(result.get("timings", {}))
+    timings["total"] = time.perf_counter() - start
+    return result, timings
+
+
+def run_queries(qa, queries, workers=4):
+    # Runs queries on a thread pool (retrieval and LLM calls are I/O bound) and yields
+    # (query, result, timings) in input order as results become available
+    with ThreadPoolExecutor(workers) as executor:
+        for query, (result, timings) in zip(queries, executor.map(lambda q: timed_query(qa, q), queries)):
+            yield query, result, timings
+
+
+def summarize(records, elapsed, workers):
+    # records: list of {"query", "cached", <stage>: seconds}
+    summary = {"queries": len(records), "workers": workers, "elapsed_sec": elapsed,
+               "qps": len(records) / elapsed if elapsed else 0.0,
+               "cached": sum(r["cached"] for r in records), "stages": {}}
+    for stage in STAGES:
+        values = np.array([r.get(stage, 0.0) for r in records]) * 1000
+        if len(values):
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            summary["stages"][stage] = {"mean_ms": values.mean(), "p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+    return summary
+
+
+def write_report(summary, records, json_path=None, csv_path=None):
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"summary": summary, "queries": records}, f, indent=2)
+    if csv_path:
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["query", "cached", *STAGES])
+            writer.writeheader()
+            writer.writerows(records)
+
+
+def print_summary(summary):
+    print(f"{summary['queries']} queries in {summary['elapsed_sec']:.2f} sec with {summary['workers']} workers "
+          f"→ {summary['qps']:.2f} QPS ({summary['cached']} answered from cache)")
+    for stage, s in summary["stages"].items():
+        print(f"  - {stage:<9} p50: {s['p50_ms']:8.1f} ms  p95: {s['p95_ms']:8.1f} ms  p99: {s['p99_ms']:8.1f} ms")
@@ -1,15 +1,15 @@
 # streamlit_app.py
 
 import streamlit as st
-from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.embeddings import OpenAIEmbeddings, HuggingFaceEmbeddings
-from langchain.vectorstores import FAISS, Chroma
 from langchain.chat_models import ChatOpenAI
 from langchain.chains import RetrievalQA
 from dotenv import load_dotenv
 from pathlib import Path
 import os
+from index_store import IndexStore
+from answer_cache import AnswerCache, CachedRetrievalQA
+from hybrid_retriever import HybridRetriever, bm25_for_vectorstore
 
 # Load API keys
 load_dotenv()
@@ -17,7 +17,7 @@ load_dotenv()
 # Sidebar
 st.sidebar.title("🔧 Settings")
 embedding_option = st.sidebar.selectbox("Embedding Model", ["OpenAI", "HuggingFace"])
-retriever_option = st.sidebar.selectbox("Retriever Type", ["Similarity", "MMR"])
+retriever_option = st.sidebar.selectbox("Retriever Type", ["Similarity", "MMR", "Hybrid (BM25 + dense)"])
 
 st.title("📄 RAG-based Document QA")
 st.markdown("Upload a PDF or use existing ones to ask questions about their content.")
@@ -33,35 +33,50 @@ if uploaded_file is not None:
     with open(file_path, "wb") as f:
         f.write(uploaded_file.read())
 
-# Load and chunk documents
-all_docs = []
-for file in data_path.glob("*.pdf"):
-    loader = PyPDFLoader(str(file))
-    all_docs.extend(loader.load())
 
-splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-chunks = splitter.split_documents(all_docs)
+# Embedding model (loaded once per server process)
+@st.cache_resource
+def get_embeddings(option):
+    if option == "OpenAI":
+        return OpenAIEmbeddings()
+    return HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
 
-# Embedding model
-if embedding_option == "OpenAI":
-    embeddings = OpenAIEmbeddings()
-else:
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
 
-# Vector store
-if embedding_option == "OpenAI":
-    vectorstore = FAISS.from_documents(chunks, embeddings)
-else:
-    vectorstore = Chroma.from_documents(chunks, embeddings, collection_name="streamlit-chroma")
+# Vector store: kept in memory across reruns, and rebuilt from the on-disk index store
+# (parsing/embedding only new or modified PDFs) when the set of files changes
+@st.cache_resource(show_spinner="Indexing documents...")
+def load_vectorstore(option, files):
+    return IndexStore(get_embeddings(option), chunk_size=500, chunk_overlap=50).vectorstore(path for path, _, _ in files)
+
+
+files = tuple(sorted((str(p), p.stat().st_size, p.stat().st_mtime_ns) for p in data_path.glob("*.pdf")))
+vectorstore = load_vectorstore(embedding_option, files)
+
+# BM25 index over the same chunks, persisted next to the index store
+@st.cache_resource
+def load_bm25(option, files):
+    return bm25_for_vectorstore(load_vectorstore(option, files), "vectorstore/bm25")
+
 
 # Retriever
-search_type = "similarity" if retriever_option == "Similarity" else "mmr"
-retriever = vectorstore.as_retriever(search_type=search_type, search_kwargs={"k": 3})
+if retriever_option.startswith("Hybrid"):
+    retriever = HybridRetriever(vectorstore=vectorstore, bm25=load_bm25(embedding_option, files), k=3)
+else:
+    search_type = "similarity" if retriever_option == "Similarity" else "mmr"
+    retriever = vectorstore.as_retriever(search_type=search_type, search_kwargs={"k": 3})
 
 # LLM
 llm = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0)
 qa_chain = RetrievalQA.from_chain_type(llm=llm, retriever=retriever, return_source_documents=True)
 
+
+@st.cache_resource
+def get_answer_cache():
+    return AnswerCache("vectorstore/answer_cache.sqlite")
+
+
+qa_chain = CachedRetrievalQA(qa_chain, get_answer_cache())
+
 # Input box for question
 query = st.text_input("Ask a question about the document:")
 
@@ -74,3 +89,4 @@ if query:
     for doc in result["source_documents"]:
         st.markdown(f"- `{doc.metadata.get('source', 'N/A')}`")
 
+    st.sidebar.caption(get_answer_cache().summary())
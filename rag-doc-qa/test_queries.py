@@ -1,52 +1,83 @@
 # test_queries.py
 
-from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.embeddings import OpenAIEmbeddings
-from langchain.vectorstores import FAISS
 from langchain.chat_models import ChatOpenAI
 from langchain.chains import RetrievalQA
 from dotenv import load_dotenv
+import argparse
+import logging
 from pathlib import Path
 import time
+from index_store import IndexStore
+from answer_cache import AnswerCache, CachedRetrievalQA
+from hybrid_retriever import hybrid_retriever
+from context_packing import ContextPackingRetriever
+from query_runner import run_queries, summarize, write_report, print_summary
+
+parser = argparse.ArgumentParser(description="Run test queries concurrently and report per-stage latency")
+parser.add_argument("--queries", default="queries.txt")
+parser.add_argument("--workers", type=int, default=4, help="Concurrent queries")
+parser.add_argument("--repeat", type=int, default=1, help="Run the query list this many times")
+parser.add_argument("--retriever", choices=["dense", "hybrid"], default="dense", help="hybrid = BM25 + dense with RRF")
+parser.add_argument("--pack-context", action="store_true", help="Merge overlapping chunks and pack them into --token-budget")
+parser.add_argument("--token-budget", type=int, default=1500, help="Max context tokens sent to the LLM with --pack-context")
+parser.add_argument("--no-cache", action="store_true", help="Always call the LLM")
+parser.add_argument("--report-json", default="latency_report.json")
+parser.add_argument("--report-csv", default="latency_report.csv")
+args = parser.parse_args()
 
 # Load API key
 load_dotenv()
 
-# Load PDFs
+# Load, chunk & embed PDFs; only new or modified files are parsed and embedded
 data_path = Path("data")
-documents = []
-for file in data_path.glob("*.pdf"):
-    loader = PyPDFLoader(str(file))
-    documents.extend(loader.load())
-
-# Chunk
-splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-chunks = splitter.split_documents(documents)
-
-# Embed
 embedding = OpenAIEmbeddings()
-vectorstore = FAISS.from_documents(chunks, embedding)
-retriever = vectorstore.as_retriever()
+index_store = IndexStore(embedding, chunk_size=500, chunk_overlap=50)
+vectorstore = index_store.vectorstore(data_path.glob("*.pdf"))
+stats = index_store.stats
+print(f"Index: {stats['cached']} PDFs from cache, {stats['embedded']} embedded "
+      f"({stats['pages']} pages parsed at {stats['pages_per_sec']:.1f} pages/sec)")
+if args.retriever == "hybrid":
+    retriever = hybrid_retriever(vectorstore, bm25_path="vectorstore/bm25")
+else:
+    retriever = vectorstore.as_retriever()
+if args.pack_context:
+    logging.basicConfig(format="%(message)s")
+    logging.getLogger("context_packing").setLevel(logging.INFO)
+    retriever = ContextPackingRetriever(retriever=retriever, token_budget=args.token_budget)
 
 # LLM
 llm = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0)
 qa_chain = RetrievalQA.from_chain_type(llm=llm, retriever=retriever, return_source_documents=True)
 
+# Repeated (query, retrieved chunks) pairs are answered from the on-disk cache
+answer_cache = None if args.no_cache else AnswerCache("vectorstore/answer_cache.sqlite")
+qa_chain = CachedRetrievalQA(qa_chain, answer_cache)
+
 # Load queries
-with open("queries.txt", "r") as f:
-    queries = [line.strip() for line in f if line.strip()]
+with open(args.queries, "r") as f:
+    queries = [line.strip() for line in f if line.strip()] * args.repeat
 
-# Run and log results
-print("\nRunning test queries:\n")
-for query in queries:
+# Run concurrently and log results in input order
+print(f"\nRunning {len(queries)} test queries with {args.workers} workers:\n")
+records = []
+start = time.perf_counter()
+for query, result, timings in run_queries(qa_chain, queries, args.workers):
     print(f"Q: {query}")
-    start = time.time()
-    result = qa_chain({"query": query})
-    end = time.time()
     print("A:", result['result'])
     print("Sources:")
     for doc in result["source_documents"]:
         print("-", doc.metadata.get("source", "N/A"))
-    print(f"Response Time: {end - start:.2f} sec\n")
+    print(f"Response Time: {timings['total']:.2f} sec (retrieval {timings['retrieval']:.2f}, "
+          f"prompt {timings['prompt']:.3f}, LLM {timings['llm']:.2f}{', cached' if result['cached'] else ''})\n")
+    records.append({"query": query, "cached": result["cached"], **timings})
+elapsed = time.perf_counter() - start
 
+summary = summarize(records, elapsed, args.workers)
+print_summary(summary)
+write_report(summary, records, args.report_json, args.report_csv)
+print(f"Latency report saved to {args.report_json} and {args.report_csv}")
+if args.pack_context:
+    print(retriever.summary())
+if answer_cache is not None:
+    print(answer_cache.summary())
@@ -0,0 +1,230 @@
+# benchmark_retrievers.py — Sweep chunking, embedding models and FAISS index types against eval_set.json
+# Measures retrieval only (no LLM): recall@k / MRR, index build time, index memory and query latency.
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import re
+import time
+from pathlib import Path
+import faiss
+import numpy as np
+from langchain.document_loaders import PyPDFLoader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.embeddings import SentenceTransformerEmbeddings
+from metrics import normalize
+
+INDEX_TYPES = ("flat", "hnsw", "ivf")
+
+
+def sha(text):
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def slug(name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+
+
+def load_embeddings(model_name):
+    return SentenceTransformerEmbeddings(model_name=model_name)
+
+
+def l2_normalize(x):
+    x = np.asarray(x, dtype=np.float32)
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+
+class BenchmarkCache:
+    # On-disk cache of intermediates shared between sweep points:
+    #   chunks/<pdf hash>-<size>-<overlap>.json      (reused by every model / index type)
+    #   embeddings/<model>/<chunk set key>.npy       (reused by every index type)
+    #   queries/<model>-<questions key>.npy
+    # Each .npy has a .json sidecar with the seconds its embedding took, so cache hits
+    # report the same embedding cost as the run that computed them.
+    def __init__(self, root, pdf_paths):
+        self.root = Path(root)
+        self.pdf_paths = [str(p) for p in pdf_paths]
+        self.pdf_key = sha("".join(hashlib.sha256(Path(p).read_bytes()).hexdigest() for p in self.pdf_paths))
+        self._pages = None
+        self._models = {}
+        self._encode_latencies = {}
+
+    def _pdf_pages(self):
+        if self._pages is None:
+            self._pages = [page for path in self.pdf_paths for page in PyPDFLoader(path).load()]
+        return self._pages
+
+    def model(self, model_name):
+        if model_name not in self._models:
+            self._models[model_name] = load_embeddings(model_name)
+        return self._models[model_name]
+
+    def chunks(self, chunk_size, chunk_overlap):
+        path = self.root / "chunks" / f"{self.pdf_key}-{chunk_size}-{chunk_overlap}.json"
+        if path.exists():
+            return json.loads(path.read_text())
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        texts = [doc.page_content for doc in splitter.split_documents(self._pdf_pages())]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(texts))
+        return texts
+
+    def embed(self, model_name, texts, kind="embeddings"):
+        # Returns (L2-normalized vectors, seconds the embedding took when it was computed)
+        key = sha("\0".join(texts))
+        path = self.root / kind / slug(model_name) / f"{key}.npy"
+        timing_path = path.with_suffix(".json")
+        if path.exists() and timing_path.exists():
+            return np.load(path), json.loads(timing_path.read_text())["seconds"]
+        model = self.model(model_name)  # loaded outside the timed region
+        start = time.perf_counter()
+        if kind == "queries":
+            vectors = [model.embed_query(t) for t in texts]
+        else:
+            vectors = model.embed_documents(texts)
+        vectors = l2_normalize(vectors)
+        elapsed = time.perf_counter() - start
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, vectors)
+        timing_path.write_text(json.dumps({"seconds": elapsed, "count": len(texts)}))
+        return vectors, elapsed
+
+    def encode_latencies(self, model_name, questions, repeats):
+        # Per-question embed_query latency in ms (one warm-up call excluded); measured once per
+        # model and shared by every chunking / index point, since it does not depend on either
+        if model_name not in self._encode_latencies:
+            model = self.model(model_name)
+            model.embed_query(questions[0])
+            latencies = []
+            for _ in range(repeats):
+                for question in questions:
+                    start = time.perf_counter()
+                    model.embed_query(question)
+                    latencies.append(time.perf_counter() - start)
+            self._encode_latencies[model_name] = np.array(latencies) * 1000
+        return self._encode_latencies[model_name]
+
+
+def build_index(index_type, vectors, hnsw_m=32, nprobe=8):
+    n, dim = vectors.shape
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+    elif index_type == "ivf":
+        nlist = max(1, int(np.sqrt(n)))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.nprobe = min(nprobe, nlist)
+    else:
+        raise ValueError(f"Unknown index type: {index_type}")
+    index.add(vectors)
+    return index
+
+
+def relevance(chunks, answers, min_coverage):
+    # A chunk is relevant to a question when it contains at least min_coverage of the
+    # expected answer's normalized tokens. Returns a (questions x chunks) bool matrix.
+    chunk_tokens = [set(normalize(c).split()) for c in chunks]
+    rel = np.zeros((len(answers), len(chunks)), dtype=bool)
+    for q, answer in enumerate(answers):
+        tokens = normalize(answer).split()
+        if tokens:
+            rel[q] = [sum(t in ct for t in tokens) / len(tokens) >= min_coverage for ct in chunk_tokens]
+    return rel
+
+
+def retrieval_metrics(ranked, rel, ks):
+    # ranked: (questions x max_k) chunk ids (-1 for missing); rel: (questions x chunks)
+    hits = np.take_along_axis(rel, np.maximum(ranked, 0), axis=1) & (ranked >= 0)
+    answerable = rel.any(axis=1)
+    metrics = {f"recall@{k}": hits[answerable, :k].any(axis=1).mean() if answerable.any() else 0.0 for k in ks}
+    first = np.where(hits.any(axis=1), hits.argmax(axis=1) + 1, np.inf)
+    metrics["mrr"] = (1.0 / first[answerable]).mean() if answerable.any() else 0.0
+    metrics["answerable"] = int(answerable.sum())
+    return metrics
+
+
+def run_point(cache, eval_set, chunk_size, chunk_overlap, model_name, index_type, ks, min_coverage, repeats,
+              encode_repeats):
+    chunks = cache.chunks(chunk_size, chunk_overlap)
+    questions = [item["question"] for item in eval_set]
+    vectors, embed_sec = cache.embed(model_name, chunks)
+    queries, _ = cache.embed(model_name, questions, kind="queries")
+    encode_p50, encode_p95 = np.percentile(cache.encode_latencies(model_name, questions, encode_repeats), [50, 95])
+
+    start = time.perf_counter()
+    index = build_index(index_type, vectors)
+    build_sec = time.perf_counter() - start
+    memory_bytes = faiss.serialize_index(index).nbytes
+
+    # Single-query searches on pre-embedded queries, as in the RAG chain; repeated to stabilize
+    # the percentiles. Query encoding is reported separately (query_encode_*), since it varies by model.
+    max_k = min(max(ks), len(chunks))
+    latencies = []
+    for _ in range(repeats):
+        for q in range(len(queries)):
+            t0 = time.perf_counter()
+            index.search(queries[q:q + 1], max_k)
+            latencies.append(time.perf_counter() - t0)
+    _, ranked = index.search(queries, max_k)
+
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "model": model_name,
+        "index": index_type,
+        "chunks": len(chunks),
+        **retrieval_metrics(ranked, relevance(chunks, [item["expected_answer"] for item in eval_set], min_coverage), ks),
+        "embed_sec": embed_sec,
+        "build_sec": build_sec,
+        "index_mb": memory_bytes / 1024 ** 2,
+        "query_p50_ms": p50,
+        "query_p95_ms": p95,
+        "query_p99_ms": p99,
+        "query_encode_p50_ms": encode_p50,
+        "query_encode_p95_ms": encode_p95,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retriever benchmark over chunking / embedding / index configs")
+    parser.add_argument("--pdfs", nargs="+", default=["data/health_insurance_claim_detailed.pdf"])
+    parser.add_argument("--eval-set", default="eval_set.json")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[250, 500, 1000])
+    parser.add_argument("--chunk-overlaps", type=int, nargs="+", default=[0, 50, 100])
+    parser.add_argument("--models", nargs="+", default=["all-MiniLM-L6-v2"])
+    parser.add_argument("--index-types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--min-coverage", type=float, default=1.0, help="Answer-token coverage for a chunk to count as relevant")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed search passes over the questions")
+    parser.add_argument("--encode-repeats", type=int, default=3, help="Timed query-encoding passes per model")
+    parser.add_argument("--cache-dir", default="benchmark_cache")
+    parser.add_argument("--output", default="retriever_benchmark.csv")
+    args = parser.parse_args()
+
+    with open(args.eval_set) as f:
+        eval_set = json.load(f)
+    cache = BenchmarkCache(args.cache_dir, args.pdfs)
+
+    rows = []
+    grid = itertools.product(args.chunk_sizes, args.chunk_overlaps, args.models, args.index_types)
+    for chunk_size, chunk_overlap, model_name, index_type in grid:
+        if chunk_overlap >= chunk_size:
+            continue
+        row = run_point(cache, eval_set, chunk_size, chunk_overlap, model_name, index_type,
+                        sorted(args.k), args.min_coverage, args.repeats, args.encode_repeats)
+        rows.append(row)
+        print(f"size={chunk_size:<5} overlap={chunk_overlap:<4} {model_name:<24} {index_type:<5} "
+              + "  ".join(f"R@{k}={row[f'recall@{k}']:.2f}" for k in sorted(args.k))
+              + f"  MRR={row['mrr']:.2f}  build={row['build_sec'] * 1000:.1f}ms  mem={row['index_mb']:.3f}MB"
+              + f"  p50={row['query_p50_ms']:.3f}ms  p99={row['query_p99_ms']:.3f}ms"
+              + f"  encode p50={row['query_encode_p50_ms']:.2f}ms")
+
+    with open(args.output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else [])
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"✅ {len(rows)} configurations benchmarked. Results saved to {args.output}")
@@ -0,0 +1,85 @@
+# compare_retrievers.py — Dense vs BM25 vs hybrid (BM25-pruned dense + RRF) retrieval on eval_set.json
+import argparse
+import csv
+import json
+import os
+import time
+import numpy as np
+from langchain.document_loaders import PyPDFLoader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.vectorstores import FAISS
+from benchmark_retrievers import load_embeddings, relevance, retrieval_metrics
+from hybrid_retriever import BM25Index, HybridRetriever, vectorstore_fingerprint
+
+
+def rank_rows(search, questions, k, repeats):
+    # search(question) -> chunk rows; returns (questions x k) rows (-1 padded) and per-query latencies
+    ranked = np.full((len(questions), k), -1, dtype=np.int64)
+    latencies = []
+    for r in range(repeats):
+        for q, question in enumerate(questions):
+            start = time.perf_counter()
+            rows = search(question)
+            latencies.append(time.perf_counter() - start)
+            if r == 0:
+                ranked[q, :len(rows[:k])] = rows[:k]
+    return ranked, np.array(latencies) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare dense, BM25 and hybrid retrieval")
+    parser.add_argument("--pdfs", nargs="+", default=["data/health_insurance_claim_detailed.pdf"])
+    parser.add_argument("--eval-set", default="eval_set.json")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--candidates", type=int, default=50, help="BM25 hits scored densely by the hybrid retriever")
+    parser.add_argument("--min-coverage", type=float, default=1.0)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--bm25-path", default="bm25_index")
+    parser.add_argument("--output", default="retriever_comparison.csv")
+    args = parser.parse_args()
+
+    with open(args.eval_set) as f:
+        eval_set = json.load(f)
+    questions = [item["question"] for item in eval_set]
+
+    pages = [page for path in args.pdfs for page in PyPDFLoader(path).load()]
+    splitter = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    chunks = [doc.page_content for doc in splitter.split_documents(pages)]
+    db = FAISS.from_texts(chunks, load_embeddings(args.model), metadatas=[{"row": i} for i in range(len(chunks))])
+
+    start = time.perf_counter()
+    bm25 = BM25Index.build(chunks, fingerprint=vectorstore_fingerprint(db))
+    bm25_build = time.perf_counter() - start
+    bm25.save(args.bm25_path)
+    bm25_bytes = sum(os.path.getsize(os.path.join(args.bm25_path, name)) for name in os.listdir(args.bm25_path))
+
+    max_k = max(args.k)
+    dense = db.as_retriever(search_kwargs={"k": max_k})
+    hybrid = HybridRetriever(vectorstore=db, bm25=bm25, k=max_k, candidates=args.candidates)
+    searches = {
+        "dense": lambda q: [d.metadata["row"] for d in dense.get_relevant_documents(q)],
+        "bm25": lambda q: bm25.search(q, max_k)[0].tolist(),
+        "hybrid": lambda q: [d.metadata["row"] for d in hybrid.get_relevant_documents(q)],
+    }
+
+    rel = relevance(chunks, [item["expected_answer"] for item in eval_set], args.min_coverage)
+    rows = []
+    for name, search in searches.items():
+        ranked, latencies = rank_rows(search, questions, max_k, args.repeats)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        row = {"retriever": name, **retrieval_metrics(ranked, rel, sorted(args.k)),
+               "query_p50_ms": p50, "query_p95_ms": p95, "query_p99_ms": p99}
+        rows.append(row)
+        print(f"{name:<7} " + "  ".join(f"R@{k}={row[f'recall@{k}']:.2f}" for k in sorted(args.k))
+              + f"  MRR={row['mrr']:.2f}  p50={p50:.2f}ms  p95={p95:.2f}ms  p99={p99:.2f}ms")
+
+    print(f"BM25 index: {len(bm25.vocab)} terms, {len(bm25.doc_ids)} postings, "
+          f"{bm25_bytes / 1024:.1f} KB on disk, built in {bm25_build * 1000:.1f} ms ({len(chunks)} chunks)")
+    with open(args.output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"✅ Results saved to {args.output}")
@@ -0,0 +1 @@
+../rag-doc-qa/context_packing.py
\ No newline at end of file
@@ -1,16 +1,33 @@
 # evaluate_rag.py
 
+import argparse
 import json
 import csv
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
 import os
+import numpy as np
 from langchain.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.embeddings import SentenceTransformerEmbeddings
 from langchain.vectorstores import FAISS
 from langchain.chat_models import ChatOpenAI
 from langchain.chains import RetrievalQA
-from difflib import SequenceMatcher
+from hybrid_retriever import hybrid_retriever
+from context_packing import ContextPackingRetriever
+from metrics import Vocabulary, batch_scores, corpus_bleu, MAX_ORDER
+
+parser = argparse.ArgumentParser(description="Evaluate the RAG pipeline on eval_set.json")
+parser.add_argument("--eval-set", default="eval_set.json")
+parser.add_argument("--output", default="results.csv", help="Per-question rows, written as answers arrive")
+parser.add_argument("--report", default="eval_report.json", help="Aggregate metrics and latency")
+parser.add_argument("--retriever", choices=["dense", "hybrid"], default="dense", help="hybrid = BM25 + dense with RRF")
+parser.add_argument("--pack-context", action="store_true", help="Merge overlapping chunks and pack them into --token-budget")
+parser.add_argument("--token-budget", type=int, default=1500, help="Max context tokens sent to the LLM with --pack-context")
+parser.add_argument("--workers", type=int, default=4, help="Questions evaluated concurrently")
+args = parser.parse_args()
 
 # Load environment variables
 load_dotenv()
@@ -23,35 +40,93 @@ chunks = splitter.split_documents(documents)
 
 embedding_model = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
 db = FAISS.from_documents(chunks, embedding_model)
-retriever = db.as_retriever()
+if args.retriever == "hybrid":
+    retriever = hybrid_retriever(db)
+else:
+    retriever = db.as_retriever()
+if args.pack_context:
+    logging.basicConfig(format="%(message)s")
+    logging.getLogger("context_packing").setLevel(logging.INFO)
+    retriever = ContextPackingRetriever(retriever=retriever, token_budget=args.token_budget)
 
 # --- Initialize LLM ---
 llm = ChatOpenAI(model_name="gpt-3.5-turbo")
 qa_chain = RetrievalQA.from_chain_type(llm=llm, retriever=retriever)
 
-# --- Load eval set ---
-with open("eval_set.json", "r") as f:
+# --- Load eval set and pre-tokenize the expected answers ---
+with open(args.eval_set, "r") as f:
     eval_set = json.load(f)
+vocab = Vocabulary()
+references = [vocab.encode(item["expected_answer"]) for item in eval_set]
+
 
-# --- Evaluate and record results ---
-results = []
-for item in eval_set:
-    question = item["question"]
-    expected = item["expected_answer"]
+def answer(question):
+    start = time.perf_counter()
     predicted = qa_chain.run(question).strip()
-    similarity = SequenceMatcher(None, predicted.lower(), expected.lower()).ratio()
-    results.append({
-        "question": question,
-        "expected_answer": expected,
-        "predicted_answer": predicted,
-        "similarity": round(similarity, 3)
-    })
-
-# --- Save to CSV ---
-with open("results.csv", "w", newline="") as f:
-    writer = csv.DictWriter(f, fieldnames=results[0].keys())
+    return predicted, time.perf_counter() - start
+
+
+# --- Evaluate concurrently; each finished batch is scored and appended to the CSV ---
+fieldnames = ["index", "question", "expected_answer", "predicted_answer", "exact_match", "f1", "bleu", "latency_sec"]
+n = len(eval_set)
+scores = {"exact_match": np.zeros(n), "f1": np.zeros(n), "bleu": np.zeros(n)}
+bleu_counts = np.zeros((n, 2, MAX_ORDER), dtype=np.int64)
+pred_lengths, latencies = np.zeros(n, dtype=np.int64), np.zeros(n)
+
+start = time.perf_counter()
+with open(args.output, "w", newline="") as f, ThreadPoolExecutor(args.workers) as executor:
+    writer = csv.DictWriter(f, fieldnames=fieldnames)
     writer.writeheader()
-    writer.writerows(results)
+    pending = {executor.submit(answer, item["question"]): i for i, item in enumerate(eval_set)}
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        indices = [pending.pop(future) for future in done]
+        outputs = [future.result() for future in done]
+        predictions = [vocab.encode(predicted) for predicted, _ in outputs]
+        batch = batch_scores(predictions, [references[i] for i in indices])
+
+        for k, (i, (predicted, latency)) in enumerate(zip(indices, outputs)):
+            for metric in scores:
+                scores[metric][i] = batch[metric][k]
+            bleu_counts[i] = batch["bleu_counts"][k]
+            pred_lengths[i], latencies[i] = len(predictions[k]), latency
+            writer.writerow({
+                "index": i,
+                "question": eval_set[i]["question"],
+                "expected_answer": eval_set[i]["expected_answer"],
+                "predicted_answer": predicted,
+                "exact_match": int(batch["exact_match"][k]),
+                "f1": round(batch["f1"][k], 3),
+                "bleu": round(batch["bleu"][k], 3),
+                "latency_sec": round(latency, 3),
+            })
+        f.flush()
+elapsed = time.perf_counter() - start
 
-print("✅ Evaluation complete. Results saved to results.csv")
+# --- Aggregate report ---
+p50, p95 = np.percentile(latencies, [50, 95]) if n else (0.0, 0.0)
+report = {
+    "questions": n,
+    "workers": args.workers,
+    "exact_match": scores["exact_match"].mean() if n else 0.0,
+    "f1": scores["f1"].mean() if n else 0.0,
+    "bleu": scores["bleu"].mean() if n else 0.0,
+    "corpus_bleu": corpus_bleu(bleu_counts, pred_lengths, [len(r) for r in references]),
+    "latency_p50_sec": p50,
+    "latency_p95_sec": p95,
+    "elapsed_sec": elapsed,
+}
+if args.pack_context:
+    history = retriever.history
+    report["token_budget"] = args.token_budget
+    report["context_tokens_in"] = sum(h["tokens_in"] for h in history)
+    report["context_tokens_out"] = sum(h["tokens_out"] for h in history)
+with open(args.report, "w") as f:
+    json.dump(report, f, indent=2)
 
+print(f"✅ Evaluation complete. Results saved to {args.output}, report to {args.report}")
+print(f"  - Exact match: {report['exact_match']:.3f}  F1: {report['f1']:.3f}  "
+      f"BLEU: {report['bleu']:.3f} (corpus {report['corpus_bleu']:.3f})")
+print(f"  - Latency p50: {p50:.2f} sec, p95: {p95:.2f} sec; {n} questions in {elapsed:.1f} sec with {args.workers} workers")
+if args.pack_context:
+    print(f"  - {retriever.summary()}")
@@ -0,0 +1 @@
+../rag-doc-qa/hybrid_retriever.py
\ No newline at end of file
@@ -0,0 +1,83 @@
+# metrics.py — Exact match, token F1 and BLEU over pre-tokenized integer arrays
+import math
+import re
+import string
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+_PUNCTUATION = re.compile(f"[{re.escape(string.punctuation)}]")
+_ARTICLES = re.compile(r"\b(a|an|the)\b")
+MAX_ORDER = 4
+
+
+def normalize(text):
+    # SQuAD-style: lowercase, strip punctuation and articles, collapse whitespace
+    return " ".join(_ARTICLES.sub(" ", _PUNCTUATION.sub(" ", text.lower())).split())
+
+
+class Vocabulary:
+    # Maps normalized tokens to int ids so answers are compared as integer arrays
+    def __init__(self):
+        self.ids = {}
+
+    def encode(self, text):
+        return np.array([self.ids.setdefault(t, len(self.ids)) for t in normalize(text).split()], dtype=np.int32)
+
+
+def ngram_counts(tokens, n):
+    # Unique n-grams (as fixed-width byte keys) and their counts
+    if len(tokens) < n:
+        return np.empty(0, dtype=np.dtype((np.void, 4 * n))), np.empty(0, dtype=np.int64)
+    windows = np.ascontiguousarray(sliding_window_view(tokens, n))
+    return np.unique(windows.view(np.dtype((np.void, 4 * n))).ravel(), return_counts=True)
+
+
+def clipped_matches(pred, ref, n):
+    pred_keys, pred_counts = ngram_counts(pred, n)
+    ref_keys, ref_counts = ngram_counts(ref, n)
+    _, i, j = np.intersect1d(pred_keys, ref_keys, assume_unique=True, return_indices=True)
+    return int(np.minimum(pred_counts[i], ref_counts[j]).sum())
+
+
+def bleu_from_counts(matches, totals, pred_len, ref_len, smooth=True):
+    # matches/totals: per n-gram order. Sentence-level scores use add-one smoothing for n > 1.
+    if pred_len == 0:
+        return 0.0
+    log_precision = 0.0
+    for n, (m, t) in enumerate(zip(matches, totals), start=1):
+        if smooth and n > 1:
+            m, t = m + 1, t + 1
+        if m == 0 or t == 0:
+            return 0.0
+        log_precision += math.log(m / t) / len(matches)
+    brevity = 1.0 if pred_len > ref_len else math.exp(1 - ref_len / pred_len)
+    return brevity * math.exp(log_precision)
+
+
+def batch_scores(predictions, references):
+    # predictions, references: lists of token-id arrays. Returns per-pair arrays plus the raw
+    # BLEU counts so callers can accumulate a corpus-level score across batches.
+    n = len(predictions)
+    em, f1, bleu = np.zeros(n), np.zeros(n), np.zeros(n)
+    counts = np.zeros((n, 2, MAX_ORDER), dtype=np.int64)  # [pair, (matches, totals), order]
+    for k, (pred, ref) in enumerate(zip(predictions, references)):
+        em[k] = float(len(pred) == len(ref) and np.array_equal(pred, ref))
+        common = clipped_matches(pred, ref, 1)
+        if len(pred) == 0 or len(ref) == 0:
+            f1[k] = float(len(pred) == len(ref))
+        elif common:
+            precision, recall = common / len(pred), common / len(ref)
+            f1[k] = 2 * precision * recall / (precision + recall)
+
+        # Short answers (e.g. a name or an ID) only use n-gram orders up to their length
+        order = min(MAX_ORDER, max(len(ref), 1))
+        for i in range(MAX_ORDER):
+            counts[k, 0, i] = clipped_matches(pred, ref, i + 1) if i else common
+            counts[k, 1, i] = max(len(pred) - i, 0)
+        bleu[k] = bleu_from_counts(counts[k, 0, :order], counts[k, 1, :order], len(pred), len(ref))
+    return {"exact_match": em, "f1": f1, "bleu": bleu, "bleu_counts": counts}
+
+
+def corpus_bleu(bleu_counts, pred_lengths, ref_lengths):
+    matches, totals = bleu_counts.sum(axis=0)
+    return bleu_from_counts(matches, totals, int(np.sum(pred_lengths)), int(np.sum(ref_lengths)), smooth=False)